@@ -0,0 +1,101 @@
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+from engine import CSV_HEADERS, InventoryEngine
+from sqlite_engine import SqliteEngine
+
+WORDS = ['bolt', 'nut', 'washer', 'screw', 'bearing', 'gear', 'spring', 'valve',
+         'pump', 'filter', 'hose', 'clamp', 'belt', 'motor', 'sensor', 'relay']
+CATEGORIES = ['hardware', 'electrical', 'hydraulics', 'drives', 'consumables']
+LOCATIONS = ['Kyiv', 'Lviv', 'Odesa', 'Dnipro', 'Kharkiv']
+
+
+def make_csv(path, rows, seed=0):
+    rnd = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADERS)
+        for i in range(rows):
+            writer.writerow([
+                f"{i:08x}",
+                f"{rnd.choice(WORDS)} {rnd.choice(WORDS)} {rnd.randint(1, 999)}",
+                rnd.choice(CATEGORIES),
+                rnd.randint(0, 10000),
+                f"{rnd.uniform(0, 5000):.2f}",
+                rnd.choice(LOCATIONS),
+                "2025-01-01 00:00:00",
+            ])
+
+
+def timed(results, label, rows, fn):
+    start = time.perf_counter()
+    out = fn()
+    elapsed = time.perf_counter() - start
+    results.append((label, rows, elapsed))
+    return out
+
+
+def first_page(result, page=30):
+    # Paged results are lazy; force what the Treeview asks for on a refresh.
+    len(result)
+    result[0:page]
+    return result
+
+
+def run(rows, workdir, seed=0, backend='memory'):
+    results = []
+    path = os.path.join(workdir, f"inventory_{rows}.csv")
+    make_csv(path, rows, seed)
+
+    if backend == 'sqlite':
+        engine = SqliteEngine(os.path.join(workdir, f"inventory_{rows}.sqlite"))
+    else:
+        engine = InventoryEngine()
+    timed(results, "load", rows, lambda: engine.load(path))
+
+    for q in ('b', 'be', 'bea', 'bear', 'bearing', 'zzz'):
+        hits = timed(results, f"search '{q}'", rows, lambda: first_page(engine.query(q)))
+        results[-1] = (f"search '{q}' ({len(hits)} hits)",) + results[-1][1:]
+
+    for column in ('price', 'name'):
+        timed(results, f"sort {column} (cold)", rows, lambda: first_page(engine.query('', column)))
+        timed(results, f"sort {column} (cached)", rows, lambda: first_page(engine.query('', column)))
+        timed(results, f"sort {column} desc", rows, lambda: first_page(engine.query('', column, True)))
+    timed(results, "search+sort 'gear' by price", rows, lambda: first_page(engine.query('gear', 'price')))
+
+    rnd = random.Random(seed + 1)
+    ids = [f"{rnd.randrange(rows):08x}" for _ in range(min(rows, 1000))]
+
+    def edit():
+        for rid in ids:
+            engine.update(rid, {'id': rid, 'price': round(rnd.uniform(0, 5000), 2)})
+    timed(results, f"update x{len(ids)}", len(ids), edit)
+    timed(results, "save (journal)", len(ids), lambda: engine.save())
+    timed(results, "save (full rewrite)", rows, lambda: engine.write(path))
+    engine.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the inventory engine on synthetic data.")
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help="comma-separated row counts (default: %(default)s)")
+    parser.add_argument('--backend', choices=('memory', 'sqlite'), default='memory')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in (int(n) for n in args.sizes.split(',')):
+            print(f"\n=== {rows:,} rows ({args.backend}) ===")
+            print(f"{'operation':<36}{'seconds':>10}{'rows/s':>14}")
+            for label, n, elapsed in run(rows, workdir, args.seed, args.backend):
+                rate = n / elapsed if elapsed else float('inf')
+                print(f"{label:<36}{elapsed:>10.4f}{rate:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
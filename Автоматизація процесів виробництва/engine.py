@@ -0,0 +1,606 @@
+import bisect
+import csv
+import io
+import json
+import math
+import os
+import uuid
+from datetime import datetime
+
+CSV_HEADERS = ['id', 'name', 'category', 'quantity', 'price', 'location', 'created_at']
+IO_CHUNK_ROWS = 5000
+JOURNAL_SUFFIX = '.journal'
+JOURNAL_COMPACT_OPS = 10000
+
+
+class CsvColumnsError(ValueError):
+    pass
+
+
+def new_id():
+    return str(uuid.uuid4())[:8]
+
+
+def now_str():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def missing_csv_headers(fieldnames):
+    headers = [h.strip() for h in fieldnames] if fieldnames else []
+    if not headers or any(h not in CSV_HEADERS for h in headers):
+        return [h for h in CSV_HEADERS if h not in headers]
+    return []
+
+
+def validate_fields(raw):
+    # Coerces the raw form strings into a record. Returns the values and a
+    # list of (field, message) problems; invalid numbers fall back to 0.
+    res = {}
+    errors = []
+
+    res['id'] = raw.get('id', '').strip()
+
+    name = raw.get('name', '').strip()
+    if not name:
+        errors.append(('name', "name cannot be empty"))
+    res['name'] = name
+
+    cat = raw.get('category', '').strip()
+    if not cat:
+        errors.append(('category', "category cannot be empty"))
+    res['category'] = cat
+
+    qraw = raw.get('quantity', '').strip()
+    if qraw == '':
+        q = 0
+    else:
+        try:
+            q = int(float(qraw))
+            if q < 0:
+                raise ValueError()
+        except Exception:
+            errors.append(('quantity', "quantity must be an integer ≥ 0"))
+            q = 0
+    res['quantity'] = q
+
+    praw = raw.get('price', '').strip().replace(',', '.')
+    if praw == '':
+        p = 0.0
+    else:
+        try:
+            p = float(praw)
+            if p < 0 or not math.isfinite(p):
+                raise ValueError()
+        except Exception:
+            errors.append(('price', "price must be a number ≥ 0"))
+            p = 0.0
+    res['price'] = round(p, 2)
+
+    res['location'] = raw.get('location', '').strip()
+
+    return res, errors
+
+
+def matches(record, q):
+    return not q or (q in record['name'].lower()) or (q in record['category'].lower())
+
+
+def parse_csv_row(row):
+    entry = {}
+    # A blank id is filled in when the row is added to an engine.
+    entry['id'] = row.get('id','').strip()
+    entry['name'] = row.get('name','').strip()
+    entry['category'] = row.get('category','').strip()
+    try:
+        entry['quantity'] = int(float(row.get('quantity',0) or 0))
+        if entry['quantity'] < 0:
+            entry['quantity'] = 0
+    except Exception:
+        entry['quantity'] = 0
+    try:
+        p = str(row.get('price','0')).strip().replace(',','.')
+        entry['price'] = round(float(p or 0.0), 2)
+        if entry['price'] < 0 or not math.isfinite(entry['price']):
+            entry['price'] = 0.0
+    except Exception:
+        entry['price'] = 0.0
+    entry['location'] = row.get('location','').strip()
+    entry['created_at'] = row.get('created_at') or now_str()
+    return entry
+
+
+def read_csv_chunks(path, chunk_rows=IO_CHUNK_ROWS):
+    # Yields (records, bytes read so far) in chunks of parsed rows.
+    with open(path, 'rb') as raw:
+        f = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+        reader = csv.DictReader(f)
+        missing = missing_csv_headers(reader.fieldnames)
+        if missing:
+            raise CsvColumnsError(f"CSV does not contain required columns: {', '.join(missing)}")
+        chunk = []
+        for row in reader:
+            chunk.append(parse_csv_row(row))
+            if len(chunk) >= chunk_rows:
+                yield chunk, raw.tell()
+                chunk = []
+        yield chunk, raw.tell()
+
+
+def write_csv(path, records, progress=None, cancelled=None):
+    # Writes to a temporary file and renames it over `path`, so readers never
+    # see a half-written CSV. Returns False if `cancelled` was set midway.
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
+            writer.writeheader()
+            for i, r in enumerate(records, 1):
+                row = {k: r.get(k,'') for k in CSV_HEADERS}
+                if not row.get('created_at'):
+                    row['created_at'] = now_str()
+                writer.writerow(row)
+                if i % IO_CHUNK_ROWS == 0:
+                    if cancelled is not None and cancelled.is_set():
+                        break
+                    if progress is not None:
+                        progress(i)
+            f.flush()
+            os.fsync(f.fileno())
+        if cancelled is not None and cancelled.is_set():
+            os.remove(tmp)
+            return False
+        os.replace(tmp, path)
+        return True
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class Journal:
+    # Write-ahead log of record changes kept next to the CSV as JSON lines.
+    # The first line records the size/mtime of the CSV it applies to, so a
+    # journal left behind by an older version of the file is never replayed.
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.path = csv_path + JOURNAL_SUFFIX
+        self.ops = 0
+
+    def _base(self):
+        st = os.stat(self.csv_path)
+        return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+    def append(self, ops):
+        new = not os.path.exists(self.path)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            if new:
+                f.write(json.dumps({'base': self._base()}) + '\n')
+            f.writelines(json.dumps(op, ensure_ascii=False) + '\n' for op in ops)
+            f.flush()
+            os.fsync(f.fileno())
+        self.ops += len(ops)
+
+    def read(self):
+        # Returns the logged ops, [] if there is no journal, or None if the
+        # journal belongs to a different version of the CSV.
+        try:
+            f = open(self.path, encoding='utf-8')
+        except FileNotFoundError:
+            return []
+        ops = []
+        with f:
+            try:
+                header = json.loads(f.readline())
+                if header.get('base') != self._base():
+                    return None
+                for line in f:
+                    ops.append(json.loads(line))
+            except ValueError:
+                # A torn last line from a crash mid-append; keep what's whole.
+                pass
+        return ops
+
+    def discard(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.ops = 0
+
+    def set_aside(self):
+        # Renames a journal that can't be replayed instead of deleting the
+        # changes in it. Returns the new name, or None if there was none.
+        if not os.path.exists(self.path):
+            return None
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        aside, n = f"{self.path}.{stamp}", 1
+        while os.path.exists(aside):
+            aside, n = f"{self.path}.{stamp}-{n}", n + 1
+        os.replace(self.path, aside)
+        self.ops = 0
+        return aside
+
+    def needs_compaction(self):
+        return self.ops >= JOURNAL_COMPACT_OPS
+
+
+def sort_value(column, v):
+    if column in ('quantity', 'price'):
+        try:
+            v = float(v)
+        except Exception:
+            return 0
+        # nan doesn't compare, which would break the bisect in SortCache.
+        return v if math.isfinite(v) else 0
+    return str(v).lower()
+
+
+class SortCache:
+    # Per-column ascending orderings of (sort value, seq), built on first use
+    # and then kept current with bisect on every edit. Descending order is
+    # the same list walked backwards.
+    BULK_INVALIDATE = 64
+
+    def __init__(self):
+        self._orders = {}
+
+    def order(self, column, rows):
+        order = self._orders.get(column)
+        if order is None:
+            order = sorted((sort_value(column, r.get(column)), seq) for seq, r in rows.items())
+            self._orders[column] = order
+        return order
+
+    def add(self, seq, record):
+        for column, order in self._orders.items():
+            bisect.insort(order, (sort_value(column, record.get(column)), seq))
+
+    def add_many(self, pairs):
+        # Inserting a large batch one by one costs more than re-sorting on
+        # the next query, so big batches just drop the cached orders.
+        if len(pairs) > self.BULK_INVALIDATE:
+            self._orders.clear()
+        else:
+            for seq, record in pairs:
+                self.add(seq, record)
+
+    def remove(self, seq, record):
+        for column, order in self._orders.items():
+            i = bisect.bisect_left(order, (sort_value(column, record.get(column)), seq))
+            del order[i]
+
+    def columns(self):
+        return self._orders.keys()
+
+    def clear(self):
+        self._orders.clear()
+
+
+class SearchIndex:
+    # Trigram index over lower-cased name and category. Queries of three or
+    # more characters intersect posting sets; shorter ones scan the cached
+    # lower-cased text. The last result set is kept (and maintained on edits)
+    # so typing one more character only re-checks the previous hits.
+    N = 3
+
+    def __init__(self):
+        self._text = {}
+        self._grams = {}
+        self._last_query = None
+        self._last_hits = None
+
+    def _grams_of(self, text):
+        return {text[i:i + self.N] for i in range(len(text) - self.N + 1)}
+
+    def add(self, seq, record):
+        text = f"{record['name'].lower()}\0{record['category'].lower()}"
+        self._text[seq] = text
+        for g in self._grams_of(text):
+            self._grams.setdefault(g, set()).add(seq)
+        if self._last_query is not None and self._last_query in text:
+            self._last_hits.add(seq)
+
+    def remove(self, seq):
+        text = self._text.pop(seq)
+        for g in self._grams_of(text):
+            posting = self._grams[g]
+            posting.discard(seq)
+            if not posting:
+                del self._grams[g]
+        if self._last_hits is not None:
+            self._last_hits.discard(seq)
+
+    def clear(self):
+        self._text.clear()
+        self._grams.clear()
+        self._last_query = self._last_hits = None
+
+    def search(self, q):
+        text = self._text
+        if self._last_query is not None and self._last_query in q:
+            candidates = self._last_hits
+        elif len(q) >= self.N:
+            postings = sorted((self._grams.get(g, ()) for g in self._grams_of(q)), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+        else:
+            candidates = text.keys()
+        hits = {seq for seq in candidates if q in text[seq]}
+        self._last_query, self._last_hits = q, hits
+        return hits
+
+
+class RecordStore:
+    # Records keyed by an internal insertion sequence number, plus an
+    # id -> seq index. Renaming a record only touches the index, so every
+    # lookup, insert, update and delete is O(1) and insertion order survives.
+    # add/update/remove also log a journal op to `pending` until it is saved.
+    def __init__(self):
+        self._rows = {}
+        self._index = {}
+        self._next_seq = 0
+        self._search = SearchIndex()
+        self._sorts = SortCache()
+        self.pending = []
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows.values())
+
+    def __contains__(self, rid):
+        return rid in self._index
+
+    def get(self, rid, default=None):
+        seq = self._index.get(rid)
+        return default if seq is None else self._rows[seq]
+
+    def seq(self, rid):
+        return self._index[rid]
+
+    def order_key(self, record, column=None):
+        seq = self._index[record['id']]
+        if column is None:
+            return (seq,)
+        return (sort_value(column, record.get(column)), seq)
+
+    def _insert(self, record):
+        rid = record['id']
+        if rid in self._index:
+            raise KeyError(f"ID already exists: {rid}")
+        seq = self._next_seq
+        self._next_seq += 1
+        self._rows[seq] = record
+        self._index[rid] = seq
+        self._search.add(seq, record)
+        return seq
+
+    def add(self, record):
+        self._sorts.add(self._insert(record), record)
+        self.pending.append({'op': 'put', 'id': record['id'], 'record': dict(record)})
+        return record
+
+    def add_many(self, records):
+        # Bulk insert for CSV loads; blank and duplicate ids get a fresh id,
+        # since ids double as Treeview item ids. Returns how many did.
+        pairs = []
+        generated = 0
+        for record in records:
+            rid = record['id']
+            while not record['id'] or record['id'] in self._index:
+                record['id'] = new_id()
+            generated += record['id'] != rid
+            pairs.append((self._insert(record), record))
+        self._sorts.add_many(pairs)
+        return generated
+
+    def update(self, rid, values):
+        seq = self._index[rid]
+        new_rid = values.get('id', rid)
+        if new_rid != rid:
+            if new_rid in self._index:
+                raise KeyError(f"ID already exists: {new_rid}")
+            del self._index[rid]
+            self._index[new_rid] = seq
+        record = self._rows[seq]
+        changed = {k for k, v in values.items() if record.get(k) != v}
+        reindex = bool(changed & {'name', 'category'})
+        resort = bool(changed & self._sorts.columns())
+        if reindex:
+            self._search.remove(seq)
+        if resort:
+            self._sorts.remove(seq, record)
+        record.update(values)
+        if reindex:
+            self._search.add(seq, record)
+        if resort:
+            self._sorts.add(seq, record)
+        self.pending.append({'op': 'put', 'id': rid, 'record': dict(record)})
+        return record
+
+    def remove(self, rid):
+        seq = self._index.pop(rid)
+        record = self._rows.pop(seq)
+        self._search.remove(seq)
+        self._sorts.remove(seq, record)
+        self.pending.append({'op': 'del', 'id': rid})
+        return record
+
+    def apply(self, op):
+        rid = op['id']
+        if op['op'] == 'del':
+            if rid in self._index:
+                self.remove(rid)
+        elif rid in self._index:
+            self.update(rid, op['record'])
+        else:
+            self.add(dict(op['record']))
+
+    def clear(self):
+        self._rows.clear()
+        self._index.clear()
+        self._search.clear()
+        self._sorts.clear()
+        self.pending.clear()
+
+    def query(self, q='', column=None, reverse=False):
+        rows = self._rows
+        hits = self._search.search(q) if q else None
+        if column is None:
+            seqs = sorted(hits) if hits is not None else rows.keys()
+            result = [rows[seq] for seq in seqs]
+        elif hits is not None and len(hits) * 8 < len(rows):
+            # Few hits: sorting them directly beats walking the full order.
+            keyed = sorted((sort_value(column, rows[seq].get(column)), seq) for seq in hits)
+            result = [rows[seq] for _, seq in keyed]
+        else:
+            order = self._sorts.order(column, rows)
+            if hits is None:
+                result = [rows[seq] for _, seq in order]
+            else:
+                result = [rows[seq] for _, seq in order if seq in hits]
+        if reverse:
+            result.reverse()
+        return result
+
+
+class InventoryEngine:
+    # The inventory without any UI: a RecordStore plus the CSV file and
+    # journal it was loaded from / saved to. query() returns a plain list;
+    # `paged` backends (see sqlite_engine) return a lazily paged result.
+    paged = False
+
+    def __init__(self):
+        self.store = RecordStore()
+        self.path = None
+        self.journal = None
+        self.new_ids = 0
+        self.stale_journal = None
+
+    def __len__(self):
+        return len(self.store)
+
+    def get(self, rid):
+        return self.store.get(rid)
+
+    def add(self, values):
+        record = dict(values)
+        if not record.get('id'):
+            record['id'] = new_id()
+        record['created_at'] = now_str()
+        return self.store.add(record)
+
+    def update(self, rid, values):
+        values = dict(values)
+        if not values.get('id'):
+            values['id'] = rid
+        return self.store.update(rid, values)
+
+    def delete(self, rid):
+        return self.store.remove(rid)
+
+    def query(self, q='', column=None, reverse=False):
+        return self.store.query(q.strip().lower(), column, reverse)
+
+    def add_rows(self, rows):
+        # Ids generated here are not in the CSV, so they change on every
+        # load until the whole file is rewritten.
+        self.new_ids += self.store.add_many(rows)
+        return rows
+
+    def replay_journal(self, path, ops):
+        # Changes saved after the CSV was last rewritten (possibly before a
+        # crash) live only in the journal. A journal written against another
+        # version of the CSV, or one whose ids were just regenerated, can't be
+        # replayed; it is renamed aside (see stale_journal), not deleted.
+        journal = Journal(path)
+        self.stale_journal = None
+        if ops is None or (ops and self.new_ids):
+            self.stale_journal = journal.set_aside()
+            ops = []
+        for op in ops:
+            self.store.apply(op)
+        self.store.pending.clear()
+        journal.ops = len(ops)
+        # Journal ops are keyed by id, so with generated ids journaling stays
+        # off until write() has stored them in the CSV.
+        self.journal = None if self.new_ids else journal
+        return len(ops)
+
+    def begin_load(self):
+        # Returns the engine that a CSV load streams into; the caller keeps
+        # this one to fall back on if the load is abandoned.
+        return InventoryEngine()
+
+    def finish_load(self, path, journal_ops):
+        replayed = self.replay_journal(path, journal_ops)
+        self.path = path
+        return replayed
+
+    def abort_load(self):
+        pass
+
+    def load(self, path, progress=None):
+        target = self.begin_load()
+        rows = 0
+        try:
+            for chunk, done in read_csv_chunks(path):
+                target.add_rows(chunk)
+                rows += len(chunk)
+                if progress is not None:
+                    progress(rows, done)
+            target.finish_load(path, Journal(path).read())
+        except BaseException:
+            target.abort_load()
+            raise
+        if target is not self:
+            self.store, self.path, self.journal = target.store, target.path, target.journal
+            self.new_ids, self.stale_journal = target.new_ids, target.stale_journal
+        return rows
+
+    def can_journal(self):
+        return self.journal is not None and self.journal.csv_path == self.path and os.path.exists(self.path)
+
+    def journal_pending(self):
+        pending = self.store.pending
+        count = len(pending)
+        if pending:
+            self.journal.append(pending)
+            pending.clear()
+        return count
+
+    def snapshot(self):
+        return list(self.store)
+
+    def mark_written(self, path):
+        # The CSV at `path` now holds every change, so its journal restarts.
+        self.store.pending.clear()
+        self.path = path
+        self.new_ids = 0
+        self.journal = Journal(path)
+        self.journal.discard()
+
+    def write(self, path, progress=None, cancelled=None):
+        if not write_csv(path, self.snapshot(), progress, cancelled):
+            return False
+        self.mark_written(path)
+        return True
+
+    def save(self, path=None):
+        # Journals the pending changes when possible and rewrites the whole
+        # CSV only for a new path or once the journal is due for compaction.
+        if path is None or path == self.path:
+            if self.can_journal():
+                self.journal_pending()
+                if not self.journal.needs_compaction():
+                    return True
+            path = self.path
+        return self.write(path)
+
+    def compact(self):
+        # Folds the journal into the CSV. Unsaved changes stay out of the CSV,
+        # so this is skipped while any are pending.
+        if self.journal is None or not self.journal.ops or self.store.pending:
+            return False
+        return self.write(self.journal.csv_path)
+
+    def close(self):
+        pass
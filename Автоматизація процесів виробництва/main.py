@@ -1,10 +1,70 @@
-import csv
-import uuid
-from datetime import datetime
+import os
+import queue
+import threading
+import time
 import tkinter as tk
+from collections import deque
 from tkinter import ttk, filedialog, messagebox
 
-CSV_HEADERS = ['id', 'name', 'category', 'quantity', 'price', 'location', 'created_at']
+from engine import CsvColumnsError, InventoryEngine, Journal, matches, read_csv_chunks, validate_fields, write_csv
+from sqlite_engine import SqliteEngine
+
+SEARCH_DELAY_MS = 200
+IO_POLL_MS = 50
+LOAD_TICK_MS = 30
+LOAD_SLICE_ROWS = 500
+
+
+class IoJob:
+    # A CSV load or save running on a worker thread. The worker only talks to
+    # the Tk thread through `messages`; the Tk thread polls it with after().
+    def __init__(self, kind, path, total=0):
+        self.kind = kind
+        self.path = path
+        self.total = total
+        self.done = 0
+        self.rows = 0
+        self.messages = queue.Queue()
+        self.cancelled = threading.Event()
+        self.started = time.monotonic()
+        self.thread = None
+        self.journal_ops = None
+
+    def start(self, target, *args):
+        self.thread = threading.Thread(target=target, args=(self,) + args, daemon=True)
+        self.thread.start()
+
+    def progress_text(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        pct = f"{100 * self.done / self.total:.0f}% " if self.total else ""
+        verb = "Loading" if self.kind == 'load' else "Saving"
+        return f"{verb} {os.path.basename(self.path)}: {pct}{self.rows:,} rows ({self.rows / elapsed:,.0f} rows/s) — Esc to cancel"
+
+
+def load_csv_worker(job):
+    try:
+        for chunk, done in read_csv_chunks(job.path):
+            if job.cancelled.is_set():
+                job.messages.put(('cancelled', None))
+                return
+            job.messages.put(('rows', (chunk, done)))
+        job.messages.put(('journal', Journal(job.path).read()))
+        job.messages.put(('done', None))
+    except CsvColumnsError as e:
+        job.messages.put(('invalid', str(e)))
+    except Exception as e:
+        job.messages.put(('error', str(e)))
+
+
+def write_csv_worker(job, records):
+    try:
+        progress = lambda i: job.messages.put(('progress', i))
+        if write_csv(job.path, records, progress, job.cancelled):
+            job.messages.put(('done', job.total))
+        else:
+            job.messages.put(('cancelled', None))
+    except Exception as e:
+        job.messages.put(('error', str(e)))
 
 
 class InventoryApp(tk.Tk):
@@ -14,26 +74,44 @@ class InventoryApp(tk.Tk):
         self.geometry("1000x600")
         self.minsize(800, 480)
 
-        self.data = []
+        self.engine = InventoryEngine()
 
         self._create_menu()
         self._create_widgets()
         self._create_statusbar()
 
-        self.current_file = None
         self._sort_column = None
         self._sort_reverse = False
 
+        # Only the rows inside the viewport exist in the Treeview; _view holds
+        # the full filtered/sorted list and _top is the first visible index.
+        self._view = []
+        self._top = 0
+        self._rendered = {}
+        self._selected_id = None
+        self._form_id = None
+        self._search_job = None
+        self._applied_query = ''
+        self._io = None
+        self._prev_engine = None
+        self._load_pending = deque()
+
     def _create_menu(self):
         menubar = tk.Menu(self)
         filem = tk.Menu(menubar, tearoff=False)
         filem.add_command(label="Open...", command=self.load_csv)
         filem.add_command(label="Save", command=self.save_csv)
         filem.add_command(label="Save As...", command=self.save_csv_as)
+        filem.add_command(label="Cancel Load/Save", command=self.cancel_io)
         filem.add_separator()
-        filem.add_command(label="Exit", command=self.quit)
+        filem.add_command(label="Open Database...", command=self.open_database)
+        filem.add_command(label="Close Database", command=self.close_database)
+        filem.add_separator()
+        filem.add_command(label="Exit", command=self.on_exit)
         menubar.add_cascade(label="File", menu=filem)
         self.config(menu=menubar)
+        self.bind("<Escape>", lambda e: self.cancel_io())
+        self.protocol("WM_DELETE_WINDOW", self.on_exit)
 
     def _create_widgets(self):
         main = ttk.Frame(self)
@@ -51,7 +129,7 @@ class InventoryApp(tk.Tk):
         self.search_var = tk.StringVar()
         ent_search = ttk.Entry(search_frame, textvariable=self.search_var)
         ent_search.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(6,6))
-        ent_search.bind("<KeyRelease>", lambda e: self.refresh_tree())
+        ent_search.bind("<KeyRelease>", self._schedule_search)
         ttk.Button(search_frame, text="Clear", command=self._clear_search).pack(side=tk.LEFT)
 
         cols = ['id','name','category','quantity','price','location']
@@ -61,10 +139,17 @@ class InventoryApp(tk.Tk):
             self.tree.column(c, anchor=tk.W, width=100, minwidth=60)
         self.tree.pack(fill=tk.BOTH, expand=True)
         self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
-
-        vsb = ttk.Scrollbar(left, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=vsb.set)
-        vsb.place(in_=self.tree, relx=1.0, rely=0, relheight=1.0, bordermode="outside")
+        self.tree.bind("<Configure>", lambda e: self._render_window())
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self._scroll_rows(-3))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_rows(3))
+        self.tree.bind("<Up>", lambda e: self._on_key_nav(-1))
+        self.tree.bind("<Down>", lambda e: self._on_key_nav(1))
+        self.tree.bind("<Prior>", lambda e: self._scroll_rows(-self._page_size()))
+        self.tree.bind("<Next>", lambda e: self._scroll_rows(self._page_size()))
+
+        self.vsb = ttk.Scrollbar(left, orient="vertical", command=self._on_scrollbar)
+        self.vsb.place(in_=self.tree, relx=1.0, rely=0, relheight=1.0, bordermode="outside")
 
         form = ttk.Frame(right)
         form.pack(fill=tk.Y, padx=4, pady=4, anchor=tk.N)
@@ -109,15 +194,37 @@ class InventoryApp(tk.Tk):
 
     def _clear_search(self):
         self.search_var.set("")
+        self._run_search()
+
+    def _schedule_search(self, event=None):
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(SEARCH_DELAY_MS, self._run_search)
+
+    def _run_search(self):
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+            self._search_job = None
+        q = self.search_var.get().strip().lower()
+        if q == self._applied_query:
+            return
+        self._top = 0
         self.refresh_tree()
 
     def _on_heading_click(self, col):
         if self._sort_column == col:
+            # Descending is the ascending order reversed, so flipping the
+            # direction never needs a re-sort.
             self._sort_reverse = not self._sort_reverse
+            if self.engine.paged:
+                self.refresh_tree()
+            else:
+                self._view.reverse()
+                self._render_window()
         else:
             self._sort_column = col
             self._sort_reverse = False
-        self.refresh_tree()
+            self.refresh_tree()
         self._set_status(f"Sorting by '{col}' {'descending' if self._sort_reverse else 'ascending'}", 3000)
 
     def _on_tree_select(self, event):
@@ -125,68 +232,80 @@ class InventoryApp(tk.Tk):
         if not sel:
             return
         iid = sel[0]
-        item = self.tree.item(iid)['values']
-        mapping = dict(zip(['id','name','category','quantity','price','location'], item))
+        self._selected_id = iid
+        if iid == self._form_id:
+            return
+        self._form_id = iid
+        mapping = self.engine.get(iid) or {}
         for k in ['id','name','category','quantity','price','location']:
             var, ent = self.entries[k]
             var.set(str(mapping.get(k,'')))
         self._set_status(f"Selected: {mapping.get('name','')}", 3000)
 
     def add_item(self):
+        if self._io_busy():
+            return
         values, valid = self._read_form(validate=True)
         if not valid:
             return
-        if not values['id']:
-            values['id'] = str(uuid.uuid4())[:8]
-        else:
-            if any(d['id'] == values['id'] for d in self.data):
-                self._set_status("ID already exists", 5000)
-                self._highlight_field('id')
-                return
-        values['created_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.data.append(values)
-        self.refresh_tree()
+        try:
+            record = self.engine.add(values)
+        except KeyError:
+            self._set_status("ID already exists", 5000)
+            self._highlight_field('id')
+            return
+        self._view_insert(record)
         self.clear_form()
         self._set_status("Record added", 4000)
 
     def update_item(self):
-        sel = self.tree.selection()
-        if not sel:
+        if self._io_busy():
+            return
+        if not self._selected_id:
             messagebox.showinfo("Update", "Select a record in the table to update.")
             return
-        iid = sel[0]
-        old_values = self.tree.item(iid)['values']
-        old_id = str(old_values[0])
+        old_id = self._selected_id
         values, valid = self._read_form(validate=True)
         if not valid:
             return
-        if values['id'] != old_id and any(d['id'] == values['id'] for d in self.data):
+        if values['id'] and values['id'] != old_id and self.engine.get(values['id']) is not None:
             self._set_status("ID already exists", 5000)
             self._highlight_field('id')
             return
-        for d in self.data:
-            if d['id'] == old_id:
-                d.update(values)
-                break
-        self.refresh_tree()
+        record = self.engine.get(old_id)
+        if record is None:
+            return
+        self._view_remove(record)
+        try:
+            record = self.engine.update(old_id, values)
+        except KeyError:
+            self._view_update(old_id, record)
+            self._set_status("ID already exists", 5000)
+            self._highlight_field('id')
+            return
+        self._view_update(old_id, record)
         self._set_status("Record updated", 4000)
 
     def delete_item(self):
-        sel = self.tree.selection()
-        if not sel:
+        if self._io_busy():
+            return
+        if not self._selected_id:
             messagebox.showinfo("Delete", "Select a record in the table to delete.")
             return
         if not messagebox.askyesno("Confirmation", "Are you sure you want to delete the selected record?"):
             return
-        iid = sel[0]
-        vals = self.tree.item(iid)['values']
-        del_id = str(vals[0])
-        self.data = [d for d in self.data if d['id'] != del_id]
-        self.refresh_tree()
+        del_id = self._selected_id
+        record = self.engine.get(del_id)
+        if record is not None:
+            self._view_remove(record)
+            self.engine.delete(del_id)
+        self._selected_id = None
+        self._view_delete(del_id)
         self.clear_form()
         self._set_status("Record deleted", 4000)
 
     def clear_form(self):
+        self._form_id = None
         for var, ent in self.entries.values():
             var.set("")
             ent.configure(background='white')
@@ -199,158 +318,378 @@ class InventoryApp(tk.Tk):
             self.after(2000, lambda: ent.configure(background='white'))
 
     def _read_form(self, validate=False):
-       
-        res = {}
-        valid = True
         for _, ent in self.entries.values():
             ent.configure(background='white')
-
-        idv = self.entries['id'][0].get().strip()
-        res['id'] = idv
-
-        name = self.entries['name'][0].get().strip()
-        if validate and not name:
-            self._set_status("Error: name cannot be empty", 5000)
-            self._highlight_field('name')
-            valid = False
-        res['name'] = name
-
-        cat = self.entries['category'][0].get().strip()
-        if validate and not cat:
-            self._set_status("Error: category cannot be empty", 5000)
-            self._highlight_field('category')
-            valid = False
-        res['category'] = cat
-
-        qraw = self.entries['quantity'][0].get().strip()
-        if qraw == '':
-            q = 0
-        else:
-            try:
-                q = int(float(qraw))
-                if q < 0:
-                    raise ValueError()
-            except Exception:
-                if validate:
-                    self._set_status("Error: quantity must be an integer ≥ 0", 5000)
-                    self._highlight_field('quantity')
-                    valid = False
-                q = 0
-        res['quantity'] = q
-
-        praw = self.entries['price'][0].get().strip().replace(',', '.')
-        if praw == '':
-            p = 0.0
-        else:
-            try:
-                p = float(praw)
-                if p < 0:
-                    raise ValueError()
-            except Exception:
-                if validate:
-                    self._set_status("Error: price must be a number ≥ 0", 5000)
-                    self._highlight_field('price')
-                    valid = False
-                p = 0.0
-        res['price'] = round(p, 2)
-
-        
-        loc = self.entries['location'][0].get().strip()
-        res['location'] = loc
-
-        return res, valid
+        raw = {k: var.get() for k, (var, _) in self.entries.items()}
+        res, errors = validate_fields(raw)
+        if not validate:
+            return res, True
+        for key, message in errors:
+            self._set_status(f"Error: {message}", 5000)
+            self._highlight_field(key)
+        return res, not errors
+
+    def _matches(self, r):
+        return matches(r, self._applied_query)
 
     def refresh_tree(self):
-        for r in self.tree.get_children():
-            self.tree.delete(r)
         q = self.search_var.get().strip().lower()
-        rows = list(self.data)
-        if q:
-            rows = [r for r in rows if (q in r['name'].lower()) or (q in r['category'].lower())]
-        if self._sort_column:
-            key = self._sort_column
-            def sort_key(x):
-                v = x.get(key)
-                if key in ('quantity', 'price'):
-                    try:
-                        return float(v)
-                    except Exception:
-                        return 0
-                return str(v).lower()
-            rows.sort(key=sort_key, reverse=self._sort_reverse)
-        for r in rows:
+        self._applied_query = q
+        self._view = self.engine.query(q, self._sort_column, self._sort_reverse)
+        self._render_window()
+
+    def _view_position(self, record):
+        # Insertion point that keeps _view in the order a full refresh_tree()
+        # would produce, using the same (sort value, seq) keys as the store.
+        order_key = self.engine.store.order_key
+        column = self._sort_column
+        k = order_key(record, column)
+        lo, hi = 0, len(self._view)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mk = order_key(self._view[mid], column)
+            if (mk > k) if self._sort_reverse else (mk < k):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    # A paged engine's result is a live query rather than a list, so edits
+    # just re-run it; only the count and the visible page are fetched.
+    def _view_insert(self, record):
+        if self.engine.paged:
+            self.refresh_tree()
+        elif self._matches(record):
+            self._view.insert(self._view_position(record), record)
+            self._render_window()
+
+    def _view_remove(self, record):
+        if self.engine.paged:
+            return
+        i = self._view_position(record)
+        if i < len(self._view) and self._view[i] is record:
+            del self._view[i]
+
+    def _view_delete(self, rid):
+        self._drop_row(rid)
+        if self.engine.paged:
+            self.refresh_tree()
+        else:
+            self._render_window()
+
+    def _view_update(self, old_id, record):
+        # The caller has already taken the record out of _view with
+        # _view_remove() while it still had its old id and sort key.
+        if old_id != record['id']:
+            self._drop_row(old_id)
+            if self._selected_id == old_id:
+                self._selected_id = record['id']
+            if self._form_id == old_id:
+                self._form_id = record['id']
+        if self.engine.paged:
+            return self.refresh_tree()
+        if self._matches(record):
+            self._view.insert(self._view_position(record), record)
+        self._render_window()
+
+    def _drop_row(self, iid):
+        self._rendered.pop(iid, None)
+        if self.tree.exists(iid):
+            self.tree.delete(iid)
+
+    def _page_size(self):
+        rowheight = ttk.Style(self).lookup('Treeview', 'rowheight')
+        try:
+            rowheight = int(rowheight)
+        except (TypeError, ValueError):
+            rowheight = 20
+        height = self.tree.winfo_height()
+        if height <= 1:
+            height = int(self.tree.cget('height')) * rowheight + 24
+        return max(1, (height - 24) // rowheight)
+
+    def _render_window(self):
+        page = self._page_size()
+        self._top = max(0, min(self._top, len(self._view) - page))
+        rows = self._view[self._top:self._top + page]
+
+        wanted = {r['id'] for r in rows}
+        stale = [iid for iid in self.tree.get_children() if iid not in wanted]
+        if stale:
+            self.tree.delete(*stale)
+            for iid in stale:
+                self._rendered.pop(iid, None)
+
+        for pos, r in enumerate(rows):
+            iid = r['id']
             vals = (r.get('id',''), r.get('name',''), r.get('category',''), r.get('quantity',0), r.get('price',0.0), r.get('location',''))
-            self.tree.insert('', tk.END, values=vals)
+            if iid not in self._rendered:
+                self.tree.insert('', pos, iid=iid, values=vals)
+            else:
+                if self._rendered[iid] != vals:
+                    self.tree.item(iid, values=vals)
+                if self.tree.index(iid) != pos:
+                    self.tree.move(iid, '', pos)
+            self._rendered[iid] = vals
+
+        if self._selected_id in wanted and self.tree.selection() != (self._selected_id,):
+            self.tree.selection_set(self._selected_id)
+
+        total = len(self._view)
+        if total:
+            self.vsb.set(self._top / total, min(1.0, (self._top + page) / total))
+        else:
+            self.vsb.set(0.0, 1.0)
+
+    def _scroll_rows(self, delta):
+        self._top += delta
+        self._render_window()
+        return "break"
+
+    def _on_mousewheel(self, event):
+        step = -1 if event.delta > 0 else 1
+        return self._scroll_rows(step * max(1, abs(event.delta) // 120) * 3)
+
+    def _on_scrollbar(self, action, *args):
+        if action == 'moveto':
+            self._top = int(float(args[0]) * len(self._view))
+            self._render_window()
+        elif action == 'scroll':
+            n = int(args[0])
+            self._scroll_rows(n * self._page_size() if args[1] == 'pages' else n)
+
+    def _on_key_nav(self, delta):
+        children = self.tree.get_children()
+        sel = self.tree.selection()
+        if not children or not sel:
+            return None
+        edge = children[-1] if delta > 0 else children[0]
+        if sel[0] != edge:
+            return None
+        self._scroll_rows(delta)
+        children = self.tree.get_children()
+        nxt = children[-1] if delta > 0 else children[0]
+        self.tree.selection_set(nxt)
+        self.tree.see(nxt)
+        return "break"
+
+    def _io_busy(self):
+        if self._io is None:
+            return False
+        self._set_status("Busy: " + self._io.progress_text())
+        return True
+
+    def cancel_io(self):
+        if self._io is not None:
+            self._io.cancelled.set()
+            self._set_status("Cancelling...")
 
     def load_csv(self):
+        if self._io_busy():
+            return
         path = filedialog.askopenfilename(filetypes=[("CSV files","*.csv"),("All files","*.*")])
         if not path:
             return
         try:
-            with open(path, newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                headers = [h.strip() for h in reader.fieldnames] if reader.fieldnames else []
-                if not headers or any(h not in CSV_HEADERS for h in headers):
-                    missing = [h for h in CSV_HEADERS if h not in headers]
-                    if missing:
-                        messagebox.showerror("Error", f"CSV does not contain required columns: {', '.join(missing)}")
-                        return
-                newdata = []
-                for row in reader:
-                    entry = {}
-                    entry['id'] = row.get('id','').strip() or str(uuid.uuid4())[:8]
-                    entry['name'] = row.get('name','').strip()
-                    entry['category'] = row.get('category','').strip()
-                    try:
-                        entry['quantity'] = int(float(row.get('quantity',0) or 0))
-                        if entry['quantity'] < 0:
-                            entry['quantity'] = 0
-                    except Exception:
-                        entry['quantity'] = 0
-                    try:
-                        p = str(row.get('price','0')).strip().replace(',','.')
-                        entry['price'] = round(float(p or 0.0), 2)
-                        if entry['price'] < 0:
-                            entry['price'] = 0.0
-                    except Exception:
-                        entry['price'] = 0.0
-                    entry['location'] = row.get('location','').strip()
-                    entry['created_at'] = row.get('created_at') or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    newdata.append(entry)
-            self.data = newdata
-            self.current_file = path
-            self.refresh_tree()
-            self._set_status(f"Loaded from {path}", 4000)
-        except Exception as e:
+            total = os.path.getsize(path)
+        except OSError as e:
             messagebox.showerror("Error opening CSV", str(e))
+            return
+        # Loading into a database replaces everything in it.
+        if self.engine.paged and len(self.engine) and not messagebox.askyesno(
+                "Open CSV", f"Replace all {len(self.engine):,} rows in {self.engine.db_path} "
+                            f"with the contents of {os.path.basename(path)}?"):
+            return
+        # Rows stream into the engine returned by begin_load() as the worker
+        # parses them; abort_load() and the previous engine undo it.
+        self._prev_engine = self.engine
+        self.engine = self.engine.begin_load()
+        self._top = 0
+        self._selected_id = None
+        self._form_id = None
+        self.refresh_tree()
+        self._load_pending.clear()
+        self._io = IoJob('load', path, total)
+        self._io.start(load_csv_worker)
+        self.after(IO_POLL_MS, self._poll_load)
+
+    def _poll_load(self):
+        # Inserting and indexing rows is slower than parsing them, so each
+        # callback only spends about LOAD_TICK_MS applying LOAD_SLICE_ROWS
+        # slices and then hands control back to Tk; the status line and
+        # Esc/Cancel stay live for the whole load. Once cancelled, queued rows
+        # are skipped and the queue is drained in one go.
+        job = self._io
+        pending = self._load_pending
+        deadline = time.monotonic() + LOAD_TICK_MS / 1000
+        try:
+            while job.cancelled.is_set() or time.monotonic() < deadline:
+                if pending:
+                    rows = pending.popleft()
+                    if not job.cancelled.is_set():
+                        self._add_loaded_rows(rows)
+                        job.rows += len(rows)
+                    continue
+                kind, payload = job.messages.get_nowait()
+                if kind == 'rows':
+                    rows, job.done = payload
+                    pending.extend(rows[i:i + LOAD_SLICE_ROWS] for i in range(0, len(rows), LOAD_SLICE_ROWS))
+                    continue
+                if kind == 'journal':
+                    job.journal_ops = payload
+                    continue
+                self._io = None
+                pending.clear()
+                if kind == 'done' and job.cancelled.is_set():
+                    kind = 'cancelled'
+                if kind == 'done':
+                    ops = self.engine.finish_load(job.path, job.journal_ops)
+                    self._prev_engine = None
+                    self.refresh_tree()
+                    replayed = f" (+{ops:,} journaled changes)" if ops else ""
+                    self._set_status(f"Loaded {job.rows:,} rows from {job.path}{replayed}", 4000)
+                    if self.engine.stale_journal:
+                        messagebox.showwarning(
+                            "Journal not applied",
+                            f"Saved changes in the journal no longer match {job.path} and were "
+                            f"not applied. They were kept in {self.engine.stale_journal}.")
+                    return
+                self.engine.abort_load()
+                self.engine = self._prev_engine
+                self._prev_engine = None
+                self.refresh_tree()
+                if kind == 'cancelled':
+                    self._set_status("Loading cancelled", 4000)
+                elif kind == 'invalid':
+                    self._set_status("Ready")
+                    messagebox.showerror("Error", payload)
+                else:
+                    self._set_status("Ready")
+                    messagebox.showerror("Error opening CSV", payload)
+                return
+        except queue.Empty:
+            pass
+        if self.engine.paged:
+            self.refresh_tree()
+        else:
+            self._render_window()
+        self._set_status(job.progress_text())
+        backlog = pending or not job.messages.empty()
+        self.after(1 if backlog else IO_POLL_MS, self._poll_load)
+
+    def _add_loaded_rows(self, rows):
+        # Streamed rows are appended in file order; the full sort (if any)
+        # is applied once the load finishes.
+        self.engine.add_rows(rows)
+        if not self.engine.paged:
+            self._view.extend(r for r in rows if self._matches(r))
 
     def save_csv(self):
-        if not self.current_file:
+        path = self.engine.path
+        if not path:
             return self.save_csv_as()
-        return self._write_csv(self.current_file)
+        if self._io_busy():
+            return False
+        if not self.engine.can_journal():
+            return self._write_csv(path)
+        try:
+            count = self.engine.journal_pending()
+        except Exception as e:
+            messagebox.showerror("Error saving CSV", str(e))
+            return False
+        if self.engine.journal.needs_compaction():
+            return self._write_csv(path)
+        self._set_status(f"Saved {count} change(s) to {self.engine.journal.path}", 4000)
+        return True
 
     def save_csv_as(self):
+        if self._io_busy():
+            return
         path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files","*.csv"),("All files","*.*")])
         if not path:
             return
-        self.current_file = path
+        self.engine.path = path
         return self._write_csv(path)
 
     def _write_csv(self, path):
+        if self._io_busy():
+            return False
+        # Edits are blocked while the job runs, so the worker can read the
+        # record dicts directly from this snapshot of the store.
+        records = self.engine.snapshot()
+        self._io = IoJob('save', path, len(self.engine))
+        self._io.start(write_csv_worker, records)
+        self.after(IO_POLL_MS, self._poll_save)
+        return True
+
+    def _poll_save(self):
+        job = self._io
+        try:
+            while True:
+                kind, payload = job.messages.get_nowait()
+                if kind == 'progress':
+                    job.done = job.rows = payload
+                    continue
+                self._io = None
+                if kind == 'done':
+                    self.engine.mark_written(job.path)
+                    self._set_status(f"Saved to {job.path}", 4000)
+                elif kind == 'cancelled':
+                    self._set_status("Saving cancelled", 4000)
+                else:
+                    self._set_status("Ready")
+                    messagebox.showerror("Error saving CSV", payload)
+                return
+        except queue.Empty:
+            pass
+        self._set_status(job.progress_text())
+        self.after(IO_POLL_MS, self._poll_save)
+
+    def _use_engine(self, engine):
+        self.engine.close()
+        self.engine = engine
+        self._top = 0
+        self._selected_id = None
+        self._form_id = None
+        self.refresh_tree()
+
+    def open_database(self):
+        if self._io_busy():
+            return
+        path = filedialog.asksaveasfilename(title="Open or create database", defaultextension=".sqlite",
+                                            confirmoverwrite=False,
+                                            filetypes=[("SQLite databases","*.sqlite *.db"),("All files","*.*")])
+        if not path:
+            return
+        try:
+            engine = SqliteEngine(path)
+        except Exception as e:
+            messagebox.showerror("Error opening database", str(e))
+            return
+        self._use_engine(engine)
+        self._set_status(f"Using database {path} ({len(engine):,} rows)", 4000)
+
+    def close_database(self):
+        if self._io_busy() or not self.engine.paged:
+            return
+        self._use_engine(InventoryEngine())
+        self._set_status("Database closed", 4000)
+
+    def on_exit(self):
+        job = self._io
+        if job is not None:
+            # Let a save finish; a load is abandoned and the old data restored.
+            if job.kind == 'load':
+                job.cancelled.set()
+            job.thread.join()
+            (self._poll_load if job.kind == 'load' else self._poll_save)()
+        # Unsaved changes are left out; the journal is replayed next time.
         try:
-            with open(path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
-                writer.writeheader()
-                for r in self.data:
-                    row = {k: r.get(k,'') for k in CSV_HEADERS}
-                    if not row.get('created_at'):
-                        row['created_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    writer.writerow(row)
-            self._set_status(f"Saved to {path}", 4000)
-            return True
+            self.engine.compact()
         except Exception as e:
             messagebox.showerror("Error saving CSV", str(e))
-            return False
+        self.engine.close()
+        self.destroy()
 
 
 def main():
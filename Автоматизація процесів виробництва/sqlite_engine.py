@@ -0,0 +1,286 @@
+import sqlite3
+
+from engine import CSV_HEADERS, IO_CHUNK_ROWS, Journal, new_id, now_str, read_csv_chunks, write_csv
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    price REAL NOT NULL,
+    location TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    name_lc TEXT NOT NULL,
+    category_lc TEXT NOT NULL,
+    location_lc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_id ON products(id COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS products_name ON products(name_lc);
+CREATE INDEX IF NOT EXISTS products_category ON products(category_lc);
+CREATE INDEX IF NOT EXISTS products_location ON products(location_lc);
+CREATE INDEX IF NOT EXISTS products_quantity ON products(quantity);
+CREATE INDEX IF NOT EXISTS products_price ON products(price);
+"""
+
+COLUMNS = ', '.join(CSV_HEADERS)
+INSERT = (f"INSERT INTO products ({COLUMNS}, name_lc, category_lc, location_lc) "
+          f"VALUES ({', '.join('?' * (len(CSV_HEADERS) + 3))})")
+
+# Same ordering as engine.sort_value: numbers for quantity/price, lower-cased
+# text otherwise, with seq (insertion order) breaking ties.
+ORDER_BY = {
+    'id': 'id COLLATE NOCASE',
+    'name': 'name_lc',
+    'category': 'category_lc',
+    'quantity': 'quantity',
+    'price': 'price',
+    'location': 'location_lc',
+}
+
+
+def _duplicate_id(error):
+    # Only this constraint means "pick another id"; NOT NULL failures and the
+    # like are real errors.
+    return str(error) == "UNIQUE constraint failed: products.id"
+
+
+def _params(record):
+    return tuple(record.get(k, '') for k in CSV_HEADERS) + (
+        record['name'].lower(), record['category'].lower(), record['location'].lower())
+
+
+class SqliteResult:
+    # A query result that only fetches the rows asked for: len() runs one
+    # COUNT and slicing runs one LIMIT/OFFSET query, so the Treeview pulls a
+    # page at a time however many rows match.
+    def __init__(self, conn, where, params, order):
+        self._conn = conn
+        self._where = where
+        self._params = params
+        self._order = order
+        self._len = None
+        self._page = None
+
+    def __len__(self):
+        if self._len is None:
+            self._len = self._conn.execute(
+                f"SELECT COUNT(*) FROM products {self._where}", self._params).fetchone()[0]
+        return self._len
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            rows = self[index:index + 1]
+            if not rows:
+                raise IndexError(index)
+            return rows[0]
+        start, stop, step = index.indices(len(self))
+        if step != 1:
+            raise ValueError("SqliteResult only supports contiguous slices")
+        if self._page is not None and self._page[0] == (start, stop):
+            return self._page[1]
+        cur = self._conn.execute(
+            f"SELECT {COLUMNS} FROM products {self._where} ORDER BY {self._order} LIMIT ? OFFSET ?",
+            self._params + (max(0, stop - start), start))
+        rows = [dict(zip(CSV_HEADERS, r)) for r in cur]
+        self._page = ((start, stop), rows)
+        return rows
+
+
+class SqliteEngine:
+    # InventoryEngine's API backed by an SQLite database file. Edits are
+    # committed as they happen, so there is no journal; the CSV path is only
+    # the import source / export target.
+    paged = True
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.path = None
+        self.journal = None
+        self.stale_journal = None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def get(self, rid):
+        row = self.conn.execute(f"SELECT {COLUMNS} FROM products WHERE id = ?", (rid,)).fetchone()
+        return None if row is None else dict(zip(CSV_HEADERS, row))
+
+    def add(self, values):
+        record = dict(values)
+        if not record.get('id'):
+            record['id'] = new_id()
+        record['created_at'] = now_str()
+        try:
+            self.conn.execute(INSERT, _params(record))
+        except sqlite3.IntegrityError as e:
+            if not _duplicate_id(e):
+                raise
+            raise KeyError(f"ID already exists: {record['id']}")
+        return record
+
+    def update(self, rid, values):
+        record = self.get(rid)
+        if record is None:
+            raise KeyError(rid)
+        record.update(values)
+        if not record.get('id'):
+            record['id'] = rid
+        sets = ', '.join(f"{k} = ?" for k in CSV_HEADERS)
+        try:
+            self.conn.execute(
+                f"UPDATE products SET {sets}, name_lc = ?, category_lc = ?, location_lc = ? WHERE id = ?",
+                _params(record) + (rid,))
+        except sqlite3.IntegrityError as e:
+            if not _duplicate_id(e):
+                raise
+            raise KeyError(f"ID already exists: {record['id']}")
+        return record
+
+    def delete(self, rid):
+        record = self.get(rid)
+        if record is None:
+            raise KeyError(rid)
+        self.conn.execute("DELETE FROM products WHERE id = ?", (rid,))
+        return record
+
+    def apply(self, op):
+        rid = op['id']
+        if op['op'] == 'del':
+            if self.get(rid) is not None:
+                self.delete(rid)
+        elif self.get(rid) is not None:
+            self.update(rid, op['record'])
+        else:
+            self.conn.execute(INSERT, _params(op['record']))
+
+    def query(self, q='', column=None, reverse=False):
+        q = q.strip().lower()
+        where, params = '', ()
+        if q:
+            where, params = "WHERE instr(name_lc, ?) > 0 OR instr(category_lc, ?) > 0", (q, q)
+        direction = ' DESC' if reverse else ''
+        order = f"seq{direction}"
+        if column is not None:
+            order = f"{ORDER_BY[column]}{direction}, {order}"
+        return SqliteResult(self.conn, where, params, order)
+
+    def add_rows(self, rows):
+        # Bulk insert with executemany; blank ids get a fresh id up front, and
+        # only a chunk that hits a duplicate id falls back to row-by-row
+        # inserts that give the duplicates fresh ids. Any other failure rolls
+        # the chunk back and is raised.
+        for record in rows:
+            if not record['id']:
+                record['id'] = new_id()
+        own_tx = not self.conn.in_transaction
+        if own_tx:
+            self.conn.execute("BEGIN")
+        self.conn.execute("SAVEPOINT add_rows")
+        try:
+            self._insert_rows(rows)
+        except BaseException:
+            self.conn.execute("ROLLBACK TO add_rows")
+            self.conn.execute("RELEASE add_rows")
+            if own_tx:
+                self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("RELEASE add_rows")
+        if own_tx:
+            self.conn.execute("COMMIT")
+        return rows
+
+    def _insert_rows(self, rows):
+        try:
+            self.conn.executemany(INSERT, map(_params, rows))
+            return
+        except sqlite3.IntegrityError as e:
+            if not _duplicate_id(e):
+                raise
+        self.conn.execute("ROLLBACK TO add_rows")
+        for record in rows:
+            while True:
+                try:
+                    self.conn.execute(INSERT, _params(record))
+                    break
+                except sqlite3.IntegrityError as e:
+                    if not _duplicate_id(e):
+                        raise
+                    record['id'] = new_id()
+
+    def begin_load(self):
+        # The whole import is one transaction: rows are visible to queries on
+        # this connection as they stream in, and abort_load() rolls back.
+        self.conn.execute("BEGIN")
+        self.conn.execute("DELETE FROM products")
+        return self
+
+    def finish_load(self, path, journal_ops):
+        for op in journal_ops or ():
+            self.apply(op)
+        self.conn.execute("COMMIT")
+        self.path = path
+        return len(journal_ops or ())
+
+    def abort_load(self):
+        if self.conn.in_transaction:
+            self.conn.execute("ROLLBACK")
+
+    def load(self, path, progress=None):
+        self.begin_load()
+        rows = 0
+        try:
+            for chunk, done in read_csv_chunks(path):
+                self.add_rows(chunk)
+                rows += len(chunk)
+                if progress is not None:
+                    progress(rows, done)
+            self.finish_load(path, Journal(path).read())
+        except BaseException:
+            self.abort_load()
+            raise
+        return rows
+
+    def can_journal(self):
+        return False
+
+    def journal_pending(self):
+        return 0
+
+    def snapshot(self):
+        # Streams committed rows through a connection of its own, opened by
+        # whichever thread consumes the generator (e.g. a CSV export worker).
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cur = conn.execute(f"SELECT {COLUMNS} FROM products ORDER BY seq")
+            while True:
+                rows = cur.fetchmany(IO_CHUNK_ROWS)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(CSV_HEADERS, row))
+        finally:
+            conn.close()
+
+    def mark_written(self, path):
+        self.path = path
+
+    def write(self, path, progress=None, cancelled=None):
+        if not write_csv(path, self.snapshot(), progress, cancelled):
+            return False
+        self.mark_written(path)
+        return True
+
+    def save(self, path=None):
+        return self.write(path or self.path)
+
+    def compact(self):
+        return False
+
+    def close(self):
+        self.abort_load()
+        self.conn.close()
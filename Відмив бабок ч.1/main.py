@@ -1,50 +1,323 @@
+import asyncio
+import inspect
+import time
+from array import array
+from bisect import bisect_right
+from collections import deque
+from contextlib import suppress
 from functools import wraps
+from itertools import accumulate, islice
 
-def shadow(limit=200):
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+LIMIT_MESSAGE = "Тіньовий ліміт перевищено. Активую схему"
+
+
+def print_limit(total, item):
+    print(LIMIT_MESSAGE)
+
+
+def print_key_limit(key, total, item):
+    print(f"{LIMIT_MESSAGE}: {key}")
+
+
+def _key_amount(item):
+    parts = item.split()
+    if len(parts) >= 2:
+        try:
+            return parts[0], float(parts[1])
+        except ValueError:
+            pass
+    return None
+
+
+def _amount(item):
+    parsed = _key_amount(item)
+    return None if parsed is None else parsed[1]
+
+
+class SlidingWindow:
+    # Running sum over the last `size` amounts and/or the last `seconds`
+    # seconds. Every amount is added once and evicted once, so updates are
+    # O(1) amortized.
+    def __init__(self, size=None, seconds=None):
+        self.size = size
+        self.seconds = seconds
+        self._entries = deque()
+        self.total = 0.0
+
+    def add(self, amount, now):
+        self._entries.append((now, amount))
+        self.total += amount
+        return self.total_at(now)
+
+    def total_at(self, now):
+        entries = self._entries
+        if self.size is not None:
+            while len(entries) > self.size:
+                self.total -= entries.popleft()[1]
+        if self.seconds is not None:
+            cutoff = now - self.seconds
+            while entries and entries[0][0] <= cutoff:
+                self.total -= entries.popleft()[1]
+        if not entries:
+            self.total = 0.0
+        return self.total
+
+
+class KeyedWindows:
+    # One SlidingWindow per transaction type (the first token of an item).
+    # on_limit(key, total, item) fires when a key's window total goes over
+    # its limit, and again only after it has dropped back under.
+    def __init__(self, size=None, seconds=None, limits=None, default_limit=None,
+                 on_limit=print_key_limit, clock=time.monotonic):
+        if size is None and seconds is None:
+            raise ValueError("KeyedWindows needs a size and/or seconds")
+        self.size = size
+        self.seconds = seconds
+        self.limits = limits or {}
+        self.default_limit = default_limit
+        self.on_limit = on_limit
+        self.clock = clock
+        self.windows = {}
+        self._over = set()
+
+    def add(self, item):
+        parsed = _key_amount(item)
+        if parsed is None:
+            return
+        key, amount = parsed
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = SlidingWindow(self.size, self.seconds)
+        total = window.add(amount, self.clock())
+
+        limit = self.limits.get(key, self.default_limit)
+        if limit is None:
+            return
+        if total <= limit:
+            self._over.discard(key)
+        elif key not in self._over:
+            self._over.add(key)
+            self.on_limit(key, total, item)
+
+    def totals(self):
+        now = self.clock()
+        return {key: window.total_at(now) for key, window in self.windows.items()}
+
+
+def _observe(gen, windows):
+    for item in gen:
+        windows.add(item)
+        yield item
+
+
+def _chunk_amounts(chunk):
+    # Amounts of a whole chunk at once, 0 for items without one. NumPy parses
+    # the second tokens in one call; only a chunk with a non-numeric token
+    # falls back to item-by-item parsing.
+    if np is not None:
+        tokens = [parts[1] if len(parts) >= 2 else "0" for parts in map(str.split, chunk)]
+        try:
+            return np.array(tokens, dtype=float)
+        except ValueError:
+            pass
+    return array("d", (0.0 if amount is None else amount for amount in map(_amount, chunk)))
+
+
+def _crossings(total, amounts, limit):
+    # Running totals for the chunk plus the indexes where the total goes from
+    # <= limit to > limit.
+    if np is not None:
+        # The running total goes into the cumsum itself so the sums round
+        # exactly like adding the items one by one.
+        prefix = np.cumsum(np.concatenate(([total], amounts)))[1:]
+        above = prefix > limit
+        before = np.concatenate(([total > limit], above[:-1]))
+        return prefix, np.flatnonzero(above & ~before).tolist()
+    prefix = list(accumulate(amounts, initial=total))[1:]
+    if min(amounts) >= 0:
+        # Non-decreasing totals cross at most once: binary search for it.
+        i = bisect_right(prefix, limit)
+        return prefix, [i] if total <= limit and i < len(prefix) else []
+    return prefix, [i for i, (a, b) in enumerate(zip([total] + prefix, prefix)) if a <= limit < b]
+
+
+def _shadow_batches(gen, limit, batch_size, on_limit):
+    total = 0
+    while chunk := list(islice(gen, batch_size)):
+        prefix, crossings = _crossings(total, _chunk_amounts(chunk), limit)
+        start = 0
+        for i in crossings:
+            yield from chunk[start:i]
+            on_limit(float(prefix[i]), chunk[i])
+            start = i
+        yield from chunk[start:]
+        total = float(prefix[-1])
+    return total
+
+
+class ShadowAsyncStream:
+    # Async counterpart of the sync wrapper. A producer task drains the wrapped
+    # async generator into a bounded queue, so a slow consumer pauses the
+    # producer; the total is kept as items are handed out. At the end
+    # StopAsyncIteration carries the total in .value (like StopIteration.value
+    # for the sync version), and it stays available as .total.
+    _END = object()
+
+    def __init__(self, agen, limit, queue_size, on_limit, windows=None):
+        self._agen = agen
+        self._limit = limit
+        self._on_limit = on_limit
+        self._windows = windows
+        self._queue = asyncio.Queue(queue_size)
+        self._producer = None
+        self._finished = False
+        self.total = 0
+
+    async def _produce(self):
+        try:
+            async for item in self._agen:
+                await self._queue.put((item, None))
+        except Exception as e:
+            await self._queue.put((self._END, e))
+        else:
+            await self._queue.put((self._END, None))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._finished:
+            raise self._stop()
+        if self._producer is None:
+            self._producer = asyncio.create_task(self._produce())
+        item, error = await self._queue.get()
+        if item is self._END:
+            self._finished = True
+            if error is not None:
+                raise error
+            raise self._stop()
+
+        if self._windows is not None:
+            self._windows.add(item)
+        amount = _amount(item)
+        if amount is not None:
+            self.total += amount
+            if self.total > self._limit:
+                self._on_limit(self.total, item)
+        return item
+
+    def _stop(self):
+        stop = StopAsyncIteration(self.total)
+        stop.value = self.total
+        return stop
+
+    async def aclose(self):
+        self._finished = True
+        if self._producer is not None:
+            self._producer.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._producer
+        await self._agen.aclose()
+
+
+def shadow(limit=200, queue_size=64, batch_size=None, on_limit=print_limit, windows=None):
+    # on_limit(total, item) is called for every item while the total is over
+    # the limit; with batch_size the stream is processed in chunks and it is
+    # called once per crossing instead. A KeyedWindows passed as `windows`
+    # also sees every item as it is yielded.
     def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @wraps(func)
+            def async_wrapper(*args, **kwargs):
+                return ShadowAsyncStream(func(*args, **kwargs), limit, queue_size, on_limit, windows)
+            return async_wrapper
+
+        def source(args, kwargs):
+            gen = func(*args, **kwargs)
+            return gen if windows is None else _observe(gen, windows)
+
+        if batch_size:
+            @wraps(func)
+            def batch_wrapper(*args, **kwargs):
+                return (yield from _shadow_batches(source(args, kwargs), limit, batch_size, on_limit))
+            return batch_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             total = 0
-            gen = func(*args, **kwargs)
+            gen = source(args, kwargs)
             for item in gen:
-                try:
-                    parts = item.split()
-                    if len(parts) >= 2:
-                        amount = float(parts[1])
-                        total += amount
-                        
-                        if total > limit:
-                            print("Тіньовий ліміт перевищено. Активую схему")
-                except ValueError:
-                    pass
-                
+                amount = _amount(item)
+                if amount is not None:
+                    total += amount
+
+                    if total > limit:
+                        on_limit(total, item)
+
                 yield item
-            
+
             return total
         return wrapper
     return decorator
 
 
+TRANSACTIONS = [
+    "payment 50",
+    "refund 50",
+    "transfer 100",
+    "garbage_data",
+    "payment 10",
+    "tax error",
+    "transfer 300"
+]
+
+
 @shadow(limit=200)
 def transaction_stream():
-    lst = [
-        "payment 50", 
-        "refund 50", 
-        "transfer 100",    
-        "garbage_data",    
-        "payment 10",      
-        "tax error",       
-        "transfer 300"     
-    ]
-    for t in lst:
+    for t in TRANSACTIONS:
+        yield t
+
+
+@shadow(limit=200, queue_size=2)
+async def async_transaction_stream():
+    for t in TRANSACTIONS:
+        await asyncio.sleep(0)
+        yield t
+
+
+windows = KeyedWindows(size=3, limits={"payment": 55, "transfer": 300})
+
+
+@shadow(limit=1000, windows=windows)
+def windowed_transaction_stream():
+    for t in TRANSACTIONS:
         yield t
 
+
+async def async_demo():
+    stream = async_transaction_stream()
+    async for t in stream:
+        print(f"Async log: {t}")
+    print(f"Async final sum: {stream.total}")
+
+
 if __name__ == "__main__":
     gen = transaction_stream()
-    
+
     while True:
         try:
-            print(f"Log: {next(gen)}") 
+            print(f"Log: {next(gen)}")
         except StopIteration as e:
             print(f"Final sum: {e.value}")
             break
+
+    asyncio.run(async_demo())
+
+    for t in windowed_transaction_stream():
+        print(f"Windowed log: {t}")
+    print(f"Window totals: {windows.totals()}")
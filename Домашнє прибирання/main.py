@@ -1,6 +1,18 @@
-from typing import List, Optional
+import heapq
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby, islice, repeat
+from operator import attrgetter, mul
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 class JunkItem:
+    __slots__ = ('name', 'quantity', 'value')
+
     def __init__(self, name: str, quantity: int, value: float):
         self.name = name
         self.quantity = quantity
@@ -9,37 +21,354 @@ class JunkItem:
     def __repr__(self):
         return f"Item(name='{self.name}', quantity={self.quantity}, value={self.value})"
 
+class JunkRow:
+    # A view of one row of a JunkItemTable; reads go straight to the columns.
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table: 'JunkItemTable', index: int):
+        self._table = table
+        self._index = index
+
+    @property
+    def name(self) -> str:
+        return self._table._pool[self._table._names[self._index]]
+
+    @property
+    def quantity(self) -> int:
+        return self._table._quantities[self._index]
+
+    @property
+    def value(self) -> float:
+        return self._table._values[self._index]
+
+    def to_item(self) -> JunkItem:
+        return JunkItem(self.name, self.quantity, self.value)
+
+    def __repr__(self):
+        return f"Item(name='{self.name}', quantity={self.quantity}, value={self.value})"
+
+class JunkItemTable:
+    # Column storage for many items: each distinct name is kept once in a
+    # string pool and rows hold its index, quantities and values live in
+    # typed arrays, so a row costs 24 bytes instead of a full object.
+    def __init__(self, items: Iterable = ()):
+        self._pool: List[str] = []
+        self._pool_index: Dict[str, int] = {}
+        self._names = array('q')
+        self._quantities = array('q')
+        self._values = array('d')
+        self.extend(items)
+
+    def _intern(self, name: str) -> int:
+        index = self._pool_index.get(name)
+        if index is None:
+            index = self._pool_index[name] = len(self._pool)
+            self._pool.append(name)
+        return index
+
+    def append(self, name: str, quantity: int, value: float) -> None:
+        self._names.append(self._intern(name))
+        self._quantities.append(quantity)
+        self._values.append(value)
+
+    def extend(self, items: Iterable) -> None:
+        for item in items:
+            self.append(item.name, item.quantity, item.value)
+
+    def _extend_columns(self, pool: List[str], names: array, quantities: array, values: array) -> None:
+        # Appends columns built against another pool (e.g. by a parse worker),
+        # remapping its name indexes onto this table's pool.
+        remap = [self._intern(name) for name in pool]
+        self._names.extend(map(remap.__getitem__, names))
+        self._quantities.extend(quantities)
+        self._values.extend(values)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            # The slice gets its own pool holding only the names it uses.
+            part = JunkItemTable()
+            names = self._names[index]
+            remap = {i: part._intern(self._pool[i]) for i in dict.fromkeys(names)}
+            part._names = array('q', map(remap.__getitem__, names))
+            part._quantities = self._quantities[index]
+            part._values = self._values[index]
+            return part
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("junk item index out of range")
+        return JunkRow(self, index)
+
+    def __iter__(self) -> Iterator[JunkRow]:
+        return map(JunkRow, repeat(self), range(len(self)))
+
+    def rows(self) -> Iterator[Tuple[str, int, float]]:
+        pool = self._pool
+        return zip(map(pool.__getitem__, self._names), self._quantities, self._values)
+
+    def total_quantity(self) -> int:
+        return sum(self._quantities)
+
+    def total_value(self) -> float:
+        return sum(map(mul, self._quantities, self._values))
+
+    def totals_by_name(self) -> Dict[str, Tuple[int, float]]:
+        quantities = [0] * len(self._pool)
+        values = [0.0] * len(self._pool)
+        for index, quantity, value in zip(self._names, self._quantities, self._values):
+            quantities[index] += quantity
+            values[index] += quantity * value
+        return {self._pool[i]: (quantities[i], values[i])
+                for i in sorted(set(self._names))}
+
+class BinaryJunkFile:
+    # Binary layout (little-endian):
+    #   header   magic, version, reserved, record count, string table offset,
+    #            record table offset
+    #   strings  UTF-8 item names back to back
+    #   records  fixed-width (name offset, name length, quantity, value)
+    # Records are fixed-width, so record N lives at records + N * RECORD.size
+    # and any item or slice is read straight from the mmap without parsing
+    # the rest of the file.
+    MAGIC = b'JUNK'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHHQQQ')
+    RECORD = struct.Struct('<QIqd')
+
+    def __init__(self, filename: str):
+        self._file = open(filename, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, _, self._count, self._strings, self._records = self.HEADER.unpack_from(self._mm, 0)
+        except (ValueError, struct.error):
+            self._file.close()
+            raise ValueError(f"'{filename}' is not a binary junk file")
+        if magic != self.MAGIC or version != self.VERSION:
+            self.close()
+            raise ValueError(f"'{filename}' is not a binary junk file")
+
+    @classmethod
+    def write(cls, items: Iterable[JunkItem], filename: str) -> int:
+        # Names go straight into the output while the fixed-width records are
+        # spooled to a temp file, so a stream of any length needs no buffering.
+        count = 0
+        offset = cls.HEADER.size
+        with open(filename, 'wb') as out, tempfile.TemporaryFile() as records:
+            out.write(b'\0' * cls.HEADER.size)
+            pack = cls.RECORD.pack
+            for item in items:
+                name = item.name.encode('utf-8')
+                out.write(name)
+                records.write(pack(offset, len(name), item.quantity, item.value))
+                offset += len(name)
+                count += 1
+            records.seek(0)
+            shutil.copyfileobj(records, out)
+            out.seek(0)
+            out.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, 0, count, cls.HEADER.size, offset))
+        return count
+
+    def _item(self, index: int) -> JunkItem:
+        name_off, name_len, quantity, value = self.RECORD.unpack_from(self._mm, self._records + index * self.RECORD.size)
+        return JunkItem(self._mm[name_off:name_off + name_len].decode('utf-8'), quantity, value)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self._item(i) for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("junk item index out of range")
+        return self._item(index)
+
+    def __iter__(self) -> Iterator[JunkItem]:
+        return map(self._item, range(self._count))
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _split_line(line: str) -> Tuple[str, int, float]:
+    parts = line.split('|')
+    if len(parts) != 3:
+        raise ValueError(f"Invalid format -> {line}")
+    try:
+        return parts[0], int(parts[1]), float(parts[2].replace(',', '.'))
+    except ValueError:
+        raise ValueError(f"Data type error -> {line}") from None
+
+def _parse_range(filename: str, start: int, end: int):
+    # Worker for JunkStorage.parse_parallel. Returns plain columns (cheap to
+    # pickle), the number of lines in the range and (local line, message)
+    # warnings; the parent turns local line numbers into file line numbers.
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        lines = file.read(end - start).decode('utf-8').split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    table = JunkItemTable()
+    warnings = []
+    for lineno, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            table.append(*_split_line(line))
+        except ValueError as e:
+            warnings.append((lineno, str(e)))
+    return table._pool, table._names, table._quantities, table._values, len(lines), warnings
+
 class JunkStorage:
-    def serialize(self, items: List[JunkItem], filename: str) -> None:
-        formatter = lambda item: f"{item.name}|{item.quantity}|{str(item.value).replace('.', ',')}\n"
+    WRITE_BATCH = 8192
+    PARALLEL_CHUNK = 32 * 1024 * 1024
+    MERGE_BUDGET = 64 * 1024 * 1024
+    # Rough in-memory cost of one parsed item on top of its name.
+    ITEM_OVERHEAD = 200
+
+    def serialize(self, items: Iterable[JunkItem], filename: str, batch_size: int = WRITE_BATCH) -> None:
+        # Accepts any iterable (including a generator over iter_parse) and
+        # writes it one joined batch at a time, so memory stays bounded.
+        # A JunkItemTable is written straight from its columns.
+        if isinstance(items, JunkItemTable):
+            lines = (self._format_fields(*row) for row in items.rows())
+        else:
+            lines = map(self._format_line, items)
         with open(filename, 'w', encoding='utf-8') as file:
-            file.writelines(map(formatter, items))
+            while batch := list(islice(lines, batch_size)):
+                file.write(''.join(batch))
 
-    def parse(self, filename: str) -> List[JunkItem]:
+    def iter_parse(self, filename: str) -> Iterator[JunkItem]:
         try:
-            with open(filename, 'r', encoding='utf-8') as file:
-                return list(filter(None, map(self._parse_line, file)))
+            file = open(filename, 'r', encoding='utf-8')
         except FileNotFoundError:
             print(f"Error: File '{filename}' not found.")
-            return []
+            return
+        with file:
+            yield from filter(None, map(self._parse_line, file))
+
+    def parse(self, filename: str) -> JunkItemTable:
+        return JunkItemTable(self.iter_parse(filename))
+
+    def parse_parallel(self, filename: str, workers: Optional[int] = None,
+                       chunk_bytes: int = PARALLEL_CHUNK) -> Tuple[JunkItemTable, List[Tuple[int, str]]]:
+        # Splits the file into ~chunk_bytes ranges that end on a newline and
+        # parses them in a process pool. Results come back in file order, so
+        # the table matches parse(); warnings are returned as (line, message)
+        # instead of being printed.
+        table = JunkItemTable()
+        warnings = []
+        try:
+            ranges = self._line_ranges(filename, chunk_bytes)
+        except FileNotFoundError:
+            print(f"Error: File '{filename}' not found.")
+            return table, warnings
+        if len(ranges) <= 1 or workers == 1:
+            results = (_parse_range(filename, start, end) for start, end in ranges)
+            return self._collect(results, table, warnings)
+        with ProcessPoolExecutor(workers) as pool:
+            starts, ends = zip(*ranges)
+            results = pool.map(_parse_range, [filename] * len(ranges), starts, ends)
+            return self._collect(results, table, warnings)
+
+    def merge(self, inputs: Iterable[str], output: str, memory_budget: int = MERGE_BUDGET) -> None:
+        # External sort by name. Items are read in runs of about memory_budget
+        # bytes, consolidated and sorted in memory, and spilled to temp files;
+        # the runs are then k-way merged and equal names folded together as
+        # they stream past. Quantities are summed and the value of the first
+        # occurrence (in input order) is kept.
+        by_name = attrgetter('name')
+        with tempfile.TemporaryDirectory() as tmp:
+            runs = []
+            for run in self._sorted_runs(inputs, memory_budget):
+                path = os.path.join(tmp, f"run{len(runs)}.txt")
+                self.serialize(run, path)
+                runs.append(path)
+            merged = heapq.merge(*map(self.iter_parse, runs), key=by_name)
+            self.serialize(self._consolidate(groupby(merged, by_name)), output)
+
+    def _sorted_runs(self, inputs: Iterable[str], memory_budget: int) -> Iterator[List[JunkItem]]:
+        run: Dict[str, JunkItem] = {}
+        used = 0
+        for filename in inputs:
+            for item in self.iter_parse(filename):
+                seen = run.get(item.name)
+                if seen is not None:
+                    seen.quantity += item.quantity
+                    continue
+                run[item.name] = item
+                used += len(item.name) + self.ITEM_OVERHEAD
+                if used >= memory_budget:
+                    yield sorted(run.values(), key=attrgetter('name'))
+                    run, used = {}, 0
+        if run:
+            yield sorted(run.values(), key=attrgetter('name'))
+
+    def _consolidate(self, groups) -> Iterator[JunkItem]:
+        for _, group in groups:
+            first = next(group)
+            first.quantity += sum(item.quantity for item in group)
+            yield first
+
+    def _collect(self, results, table: JunkItemTable, warnings: List[Tuple[int, str]]):
+        line_offset = 0
+        for pool, names, quantities, values, line_count, range_warnings in results:
+            table._extend_columns(pool, names, quantities, values)
+            warnings.extend((line_offset + lineno, msg) for lineno, msg in range_warnings)
+            line_offset += line_count
+        return table, warnings
+
+    def _line_ranges(self, filename: str, chunk_bytes: int) -> List[Tuple[int, int]]:
+        size = os.path.getsize(filename)
+        ranges = []
+        with open(filename, 'rb') as file:
+            start = 0
+            while start < size:
+                file.seek(min(start + chunk_bytes, size) - 1)
+                file.readline()
+                end = file.tell()
+                ranges.append((start, end))
+                start = end
+        return ranges
+
+    def serialize_binary(self, items: Iterable[JunkItem], filename: str) -> int:
+        return BinaryJunkFile.write(items, filename)
+
+    def open_binary(self, filename: str) -> BinaryJunkFile:
+        return BinaryJunkFile(filename)
+
+    def text_to_binary(self, text_filename: str, binary_filename: str) -> int:
+        return self.serialize_binary(self.iter_parse(text_filename), binary_filename)
+
+    def binary_to_text(self, binary_filename: str, text_filename: str) -> None:
+        with self.open_binary(binary_filename) as items:
+            self.serialize(items, text_filename)
+
+    def _format_line(self, item: JunkItem) -> str:
+        return self._format_fields(item.name, item.quantity, item.value)
+
+    def _format_fields(self, name: str, quantity: int, value: float) -> str:
+        return f"{name}|{quantity}|{str(value).replace('.', ',')}\n"
 
     def _parse_line(self, line: str) -> Optional[JunkItem]:
         line = line.strip()
         if not line: return None
-        
-        parts = line.split('|')
-        if len(parts) != 3:
-            print(f"Warning: Invalid format -> {line}")
-            return None
 
         try:
-            return JunkItem(
-                name=parts[0], 
-                quantity=int(parts[1]), 
-                value=float(parts[2].replace(',', '.'))
-            )
-        except ValueError:
-            print(f"Warning: Data type error -> {line}")
+            return JunkItem(*_split_line(line))
+        except ValueError as e:
+            print(f"Warning: {e}")
             return None
 
 if __name__ == "__main__":
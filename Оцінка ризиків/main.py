@@ -1,73 +1,449 @@
+import csv
+import heapq
+import json
+import queue
+import sys
 import threading
 import time
 import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 PRICE = 50
+STEPS = 10
+OUTCOMES = {'ok': '+', 'fail': '-', 'caught': 'x'}
+
+class RunnerLog:
+    # One byte per outcome ('+', '-', 'x') plus its time in an array('d'),
+    # instead of a list of one-character strings.
+    __slots__ = ('codes', 'times')
+
+    def __init__(self):
+        self.codes = bytearray()
+        self.times = array('d')
+
+    def append(self, status, t):
+        self.codes.append(ord(OUTCOMES[status]))
+        self.times.append(t)
+
+    def count(self, code):
+        return self.codes.count(ord(code))
+
+    def counts(self):
+        return {status: self.count(code) for status, code in OUTCOMES.items()}
+
+    def summary(self):
+        return ' '.join(f"{code}{self.count(code)}" for code in OUTCOMES.values())
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __str__(self):
+        return self.codes.decode('ascii')
+
+class InstrumentedLock:
+    # threading.Lock that counts acquisitions and contended acquisitions and
+    # sums wait and hold times. The counters are only touched while the lock
+    # is held, so they need no lock of their own.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.hold_time = 0.0
+        self._acquired_at = 0.0
+
+    def acquire(self):
+        wait = 0.0
+        if not self._lock.acquire(blocking=False):
+            start = time.perf_counter()
+            self._lock.acquire()
+            wait = time.perf_counter() - start
+            self.contended += 1
+            self.wait_time += wait
+            self.max_wait = max(self.max_wait, wait)
+        self.acquisitions += 1
+        self._acquired_at = time.perf_counter()
+        return True
+
+    def release(self):
+        self.hold_time += time.perf_counter() - self._acquired_at
+        self._lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def stats(self):
+        return {
+            'acquisitions': self.acquisitions,
+            'contended': self.contended,
+            'wait_time': self.wait_time,
+            'max_wait': self.max_wait,
+            'hold_time': self.hold_time,
+        }
+
+class ConsoleLogger(threading.Thread):
+    # The one thread that writes to the console: runners queue lines and it
+    # writes whatever has piled up in a single call. Lines above `verbosity`
+    # are dropped before they are queued (0 = quiet, 1 = per-step lines).
+    def __init__(self, verbosity=1, stream=None):
+        super().__init__(daemon=True)
+        self.verbosity = verbosity
+        self.stream = stream or sys.stdout
+        self._queue = queue.Queue()
+
+    def log(self, level, line):
+        if level <= self.verbosity:
+            self._queue.put(line)
+
+    def run(self):
+        while True:
+            lines = [self._queue.get()]
+            try:
+                while True:
+                    lines.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            self.stream.write(''.join(f"{line}\n" for line in lines if line is not None))
+            self.stream.flush()
+            if None in lines:
+                return
+
+    def close(self):
+        self._queue.put(None)
+        self.join()
 
 class Warehouse:
     def __init__(self, name, meds):
         self.name = name
         self.meds = meds
-        self.lock = threading.Lock()
+        self.lock = InstrumentedLock()
         self.start_meds = meds
 
-    def steal(self, amount):
+    def steal(self, amount, rng=random):
+        with self.lock:
+            return self.take(amount, rng)
+
+    def steal_many(self, amounts, rng=random):
+        # Reserves stock for several steps in one critical section.
         with self.lock:
-            if random.random() < 0.1:
-                return 0, 'caught'
-            if random.random() < 0.1:
-                loss = min(self.meds, amount)
-                self.meds -= loss
-                return 0, 'fail'
-            
-            stolen = min(self.meds, amount)
-            self.meds -= stolen
-            return stolen, 'ok'
+            return [self.take(amount, rng) for amount in amounts]
+
+    def take(self, amount, rng=random):
+        # The outcome of one attempt; callers that share the warehouse
+        # between threads go through steal() to hold the lock.
+        if rng.random() < 0.1:
+            return 0, 'caught'
+        if rng.random() < 0.1:
+            loss = min(self.meds, amount)
+            self.meds -= loss
+            return 0, 'fail'
+
+        stolen = min(self.meds, amount)
+        self.meds -= stolen
+        return stolen, 'ok'
 
 class Runner(threading.Thread):
-    def __init__(self, wh, name):
+    def __init__(self, wh, name, logger=None, batch=1):
         super().__init__()
         self.wh = wh
         self.runner_name = name
         self.profit = 0
-        self.log = []
+        self.log = RunnerLog()
+        self.logger = logger
+        self.batch = batch
 
     def run(self):
-        for i in range(10):
-            amt = random.randint(10, 30)
-            got, st = self.wh.steal(amt)
-            
-            if st == 'ok':
-                self.profit += got * PRICE
-                self.log.append('+')
-            elif st == 'fail':
-                self.log.append('-')
-            elif st == 'caught':
-                self.log.append('x')
-
-            bar = '#' * (i + 1)
-            print(f"[{self.runner_name}] {self.wh.name} [{bar:<10}] prof: {self.profit}")
-            time.sleep(random.uniform(0.1, 0.5))
-
-def sim(n_runners=5):
+        start = time.perf_counter()
+        i = 0
+        while i < STEPS:
+            amts = [random.randint(10, 30) for _ in range(min(self.batch, STEPS - i))]
+            if len(amts) == 1:
+                results = [self.wh.steal(amts[0])]
+            else:
+                results = self.wh.steal_many(amts)
+
+            for got, st in results:
+                if st == 'ok':
+                    self.profit += got * PRICE
+                self.log.append(st, time.perf_counter() - start)
+
+                i += 1
+                bar = '#' * i
+                line = f"[{self.runner_name}] {self.wh.name} [{bar:<10}] prof: {self.profit}"
+                if self.logger is not None:
+                    self.logger.log(1, line)
+                else:
+                    print(line)
+                time.sleep(random.uniform(0.1, 0.5))
+
+class SimRunner:
+    # Runner state for the event-driven engine; no thread behind it.
+    __slots__ = ('wh', 'runner_name', 'profit', 'log', 'step')
+
+    def __init__(self, wh, name):
+        self.wh = wh
+        self.runner_name = name
+        self.profit = 0
+        self.log = RunnerLog()
+        self.step = 0
+
+def sim(n_runners=5, verbosity=1, batch=1, out=None, fmt='csv'):
+    # batch > 1 makes each runner reserve stock for that many steps per
+    # critical section (Warehouse.steal_many). With `out`, a StreamReport is
+    # written there as well.
     print(f"start sim: {n_runners} runners")
     
     whs = [Warehouse(f"wh_{i+1}", random.randint(100, 300)) for i in range(3)]
-    runners = [Runner(random.choice(whs), f"r_{i+1}") for i in range(n_runners)]
+    logger = ConsoleLogger(verbosity)
+    logger.start()
+    runners = [Runner(random.choice(whs), f"r_{i+1}", logger, batch) for i in range(n_runners)]
 
     for r in runners:
         r.start()
 
+    writer = StreamReport(out, fmt) if out is not None else None
     for r in runners:
         r.join()
+        if writer is not None:
+            writer.runner(r)
+    logger.close()
+    if writer is not None:
+        writer.close(whs)
+
+    report(runners, whs, show_runners=n_runners <= 100)
+    lock_report(whs)
+
+def lock_report(whs):
+    print("locks:")
+    for w in whs:
+        st = w.lock.stats()
+        n = st['acquisitions'] or 1
+        print(f"{w.name} | acq: {st['acquisitions']} | contended: {st['contended']} "
+              f"({st['contended'] / n:.0%}) | wait: {st['wait_time'] * 1000:.2f}ms "
+              f"(max {st['max_wait'] * 1000:.2f}ms) | hold: {st['hold_time'] * 1000:.2f}ms")
+
+def sim_events(n_runners=5, n_warehouses=3, seed=None, verbose=False, out=None, fmt='csv', keep_logs=True):
+    # Same model as sim() in virtual time: a heap of (time, runner) events
+    # replaces the threads and time.sleep, so a run takes as long as the
+    # steps themselves. All randomness comes from one seeded Random, in the
+    # same order as a Runner draws it, so a seed reproduces a run.
+    # With `out`, each runner's StreamReport row is written the moment it
+    # finishes; keep_logs=False then frees its event log right away.
+    print(f"start event sim: {n_runners} runners, {n_warehouses} warehouses")
+    rng = random.Random(seed)
+
+    whs, runners = make_world(n_runners, n_warehouses, rng)
+    on_done = None
+    if out is not None:
+        writer = StreamReport(out, fmt)
+
+        def on_done(r):
+            writer.runner(r)
+            if not keep_logs:
+                r.log = None
+    now = run_events(runners, rng, verbose, on_done)
+    if out is not None:
+        writer.close(whs)
+
+    report(runners, whs, show_runners=keep_logs and n_runners <= 100)
+    print(f"virtual time: {now:.3f}s")
+    return runners, whs
+
+def make_world(n_runners, n_warehouses, rng):
+    whs = [Warehouse(f"wh_{i+1}", rng.randint(100, 300)) for i in range(n_warehouses)]
+    runners = [SimRunner(rng.choice(whs), f"r_{i+1}") for i in range(n_runners)]
+    return whs, runners
+
+def run_events(runners, rng, verbose=False, on_done=None):
+    # The event loop behind sim_events(); returns the final virtual time.
+    # on_done(runner) is called as each runner takes its last step.
+    events = [(0.0, i) for i in range(len(runners))]
+    randint, uniform = rng.randint, rng.uniform
+    now = 0.0
+    while events:
+        now, i = events[0]
+        r = runners[i]
+        amt = randint(10, 30)
+        got, st = r.wh.take(amt, rng)
+
+        if st == 'ok':
+            r.profit += got * PRICE
+        r.log.append(st, now)
+
+        r.step += 1
+        if verbose:
+            bar = '#' * r.step
+            print(f"{now:8.3f} [{r.runner_name}] {r.wh.name} [{bar:<10}] prof: {r.profit}")
+        if r.step < STEPS:
+            heapq.heapreplace(events, (now + uniform(0.1, 0.5), i))
+        else:
+            heapq.heappop(events)
+            if on_done is not None:
+                on_done(r)
+    return now
+
+def _replicate_python(rng, n_runners, n_warehouses):
+    whs, runners = make_world(n_runners, n_warehouses, rng)
+    run_events(runners, rng)
+    profit = sum(r.profit for r in runners)
+    caught = sum(r.log.count('x') for r in runners)
+    depletion = [(w.start_meds - w.meds) / w.start_meds for w in whs]
+    return profit, caught / (n_runners * STEPS), depletion
+
+def _replicate_numpy(rng, n_runners, n_warehouses):
+    # Timing never depends on outcomes, so every draw of the run is made up
+    # front and the event order is a sort. Each warehouse then sees its
+    # attempts in time order, and the stock an attempt finds is the initial
+    # stock minus what the earlier non-caught attempts there asked for.
+    start = rng.integers(100, 301, n_warehouses)
+    wh = rng.integers(0, n_warehouses, n_runners)
+    amt = rng.integers(10, 31, (n_runners, STEPS))
+    caught = rng.random((n_runners, STEPS)) < 0.1
+    fail = rng.random((n_runners, STEPS)) < 0.1
+    times = np.zeros((n_runners, STEPS))
+    times[:, 1:] = np.cumsum(rng.uniform(0.1, 0.5, (n_runners, STEPS - 1)), axis=1)
+
+    ev_wh = np.repeat(wh, STEPS)
+    order = np.lexsort((np.repeat(np.arange(n_runners), STEPS), times.ravel(), ev_wh))
+    w = ev_wh[order]
+    c = caught.ravel()[order]
+    demand = np.where(c, 0, amt.ravel()[order])
+    asked_before = np.cumsum(demand) - demand
+    asked_before -= asked_before[np.searchsorted(w, w)]
+    taken = np.minimum(demand, np.maximum(start[w] - asked_before, 0))
+
+    profit = int(taken[~fail.ravel()[order]].sum()) * PRICE
+    gone = np.bincount(w, weights=taken, minlength=n_warehouses)
+    return profit, float(c.mean()), (gone / start).tolist()
+
+def _replicate_chunk(seed, first, last, n_runners, n_warehouses):
+    # Replication i always gets the same independent stream for a given seed,
+    # however the replications are split between workers.
+    results = []
+    for i in range(first, last):
+        if np is not None:
+            results.append(_replicate_numpy(np.random.default_rng([seed, i]), n_runners, n_warehouses))
+        else:
+            results.append(_replicate_python(random.Random(f"{seed}:{i}"), n_runners, n_warehouses))
+    return results
+
+def sim_batch(replications=1000, n_runners=5, n_warehouses=3, seed=None, workers=None, chunk=50):
+    # Monte Carlo over independent replications spread across a process pool.
+    # Returns per-replication profit, caught rate and per-warehouse depletion
+    # (fraction of the initial stock gone).
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
+    bounds = [(i, min(i + chunk, replications)) for i in range(0, replications, chunk)]
+    args = [[seed] * len(bounds), [b[0] for b in bounds], [b[1] for b in bounds],
+            [n_runners] * len(bounds), [n_warehouses] * len(bounds)]
+    if workers == 1:
+        chunks = list(map(_replicate_chunk, *args))
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            chunks = list(pool.map(_replicate_chunk, *args))
+    results = [r for rs in chunks for r in rs]
+    return {
+        'seed': seed,
+        'profit': [r[0] for r in results],
+        'caught_rate': [r[1] for r in results],
+        'depletion': [list(col) for col in zip(*(r[2] for r in results))],
+    }
+
+def percentiles(values, qs=(5, 25, 50, 75, 95)):
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return {q: ordered[round(q / 100 * last)] for q in qs}
+
+def histogram(values, bins=10, width=40):
+    lo, hi = min(values), max(values)
+    step = (hi - lo) / bins or 1
+    counts = [0] * bins
+    for v in values:
+        counts[min(int((v - lo) / step), bins - 1)] += 1
+    top = max(counts)
+    return [(lo + k * step, lo + (k + 1) * step, n, '#' * round(n / top * width)) for k, n in enumerate(counts)]
+
+def batch_report(results):
+    n = len(results['profit'])
+    print(f"\n--- monte carlo: {n} replications (seed {results['seed']}) ---")
+    for label, values, fmt in (("tot_profit", results['profit'], "{:>10.0f}"),
+                               ("caught_rate", results['caught_rate'], "{:>10.3f}")):
+        print(f"{label}: " + " | ".join(f"p{q}: {fmt.format(v).strip()}" for q, v in percentiles(values).items()))
+        for lo, hi, count, bar in histogram(values):
+            print(f"  {fmt.format(lo)} - {fmt.format(hi)} {count:>6} {bar}")
+    print("depletion:")
+    for i, values in enumerate(results['depletion']):
+        p = percentiles(values)
+        print(f"wh_{i+1} | p5: {p[5]:.2f} | p50: {p[50]:.2f} | p95: {p[95]:.2f}")
+
+class StreamReport:
+    # Writes a CSV or JSON-lines row per runner as soon as it is handed over,
+    # keeping only per-warehouse rollups; close() adds a row per warehouse
+    # and a total row. Memory does not grow with the number of events.
+    FIELDS = ('kind', 'name', 'warehouse', 'runners', 'profit', 'ok', 'fail', 'caught',
+              'first_t', 'last_t', 'init', 'left')
+
+    def __init__(self, stream, fmt='csv'):
+        if fmt not in ('csv', 'jsonl'):
+            raise ValueError(f"unknown report format: {fmt}")
+        self.stream = stream
+        self.fmt = fmt
+        self._rollups = {}
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(stream, self.FIELDS)
+            self._csv.writeheader()
+
+    def _write(self, row):
+        if self.fmt == 'csv':
+            self._csv.writerow(row)
+        else:
+            self.stream.write(json.dumps(row) + '\n')
+
+    def runner(self, r):
+        counts = r.log.counts()
+        times = r.log.times
+        self._write({'kind': 'runner', 'name': r.runner_name, 'warehouse': r.wh.name, 'runners': 1,
+                     'profit': r.profit, **counts,
+                     'first_t': round(times[0], 6) if times else None,
+                     'last_t': round(times[-1], 6) if times else None})
+        roll = self._rollups.setdefault(r.wh.name, dict.fromkeys(('runners', 'profit', *OUTCOMES), 0))
+        roll['runners'] += 1
+        roll['profit'] += r.profit
+        for status, n in counts.items():
+            roll[status] += n
+
+    def close(self, whs):
+        total = dict.fromkeys(('runners', 'profit', *OUTCOMES, 'init', 'left'), 0)
+        for w in whs:
+            roll = self._rollups.get(w.name, dict.fromkeys(('runners', 'profit', *OUTCOMES), 0))
+            row = {**roll, 'init': w.start_meds, 'left': w.meds}
+            self._write({'kind': 'warehouse', 'name': w.name, **row})
+            for key, value in row.items():
+                total[key] += value
+        self._write({'kind': 'total', 'name': 'all', **total})
+        self.stream.flush()
 
+def report(runners, whs, show_runners=True):
     print("\n--- report ---")
     
     tot_profit = 0
     
-    print("runners:")
+    if show_runners:
+        print("runners:")
     for r in runners:
-        print(f"{r.runner_name} | prof: {r.profit} | log: {''.join(r.log)}")
+        if show_runners:
+            log = r.log if len(r.log) <= 40 else r.log.summary()
+            print(f"{r.runner_name} | prof: {r.profit} | log: {log}")
         tot_profit += r.profit
 
     print("-" * 20)
@@ -84,4 +460,7 @@ if __name__ == "__main__":
     time.sleep(1)
     print("\nNext run...")
     sim(5)
+    print("\nEvent-driven run...")
+    sim_events(5, seed=1, verbose=True)
+    batch_report(sim_batch(2000, n_runners=20, seed=1))
     
@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+
+
+def make_formulas(count, seed=0):
+    rnd = random.Random(seed)
+    ops = "+-*/^"
+    formulas = []
+    for _ in range(count):
+        parts = [str(rnd.randint(1, 99))]
+        for _ in range(rnd.randint(1, 6)):
+            parts.append(rnd.choice(ops) if parts[-1] != "^" else "*")
+            parts.append(str(rnd.randint(1, 9)) if parts[-1] == "^" else str(rnd.randint(0, 99)))
+        if rnd.random() < 0.3:
+            parts.insert(0, "(")
+            parts.insert(4, ")")
+        formulas.append("".join(parts))
+    return formulas
+
+
+async def client(path, formulas, count, depth, latencies):
+    # Keeps up to `depth` requests in flight on one connection and records
+    # the time from sending each line to reading its answer.
+    reader, writer = await asyncio.open_unix_connection(path)
+    pending = deque()
+    sent = 0
+
+    def send_one():
+        nonlocal sent
+        if sent < count:
+            pending.append(time.perf_counter())
+            writer.write(f"{formulas[sent % len(formulas)]}\n".encode("utf-8"))
+            sent += 1
+
+    for _ in range(depth):
+        send_one()
+    while pending:
+        await writer.drain()
+        await reader.readline()
+        latencies.append(time.perf_counter() - pending.popleft())
+        send_one()
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run(path, connections, requests, depth, formulas):
+    latencies = []
+    per_client = requests // connections
+    start = time.perf_counter()
+    await asyncio.gather(*(client(path, formulas[i::connections] or formulas, per_client, depth, latencies)
+                           for i in range(connections)))
+    return time.perf_counter() - start, latencies
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def wait_for_socket(path, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"server did not create {path}")
+        await asyncio.sleep(0.05)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the calculator service (main.py --serve).")
+    parser.add_argument("--socket", help="socket of a running service; if omitted one is spawned")
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200000, help="total requests (default: %(default)s)")
+    parser.add_argument("--depth", type=int, default=32, help="pipelined requests per connection")
+    parser.add_argument("--formulas", type=int, default=2000, help="distinct expressions in the mix")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    formulas = make_formulas(args.formulas, args.seed)
+    server = None
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.socket
+        if path is None:
+            path = os.path.join(tmp, "calc.sock")
+            main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+            server = subprocess.Popen([sys.executable, main_py, "--serve", path])
+        try:
+            asyncio.run(wait_for_socket(path))
+            elapsed, latencies = asyncio.run(run(path, args.connections, args.requests, args.depth, formulas))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    latencies.sort()
+    print(f"{len(latencies):,} requests over {args.connections} connections (depth {args.depth}) in {elapsed:.2f}s")
+    print(f"throughput: {len(latencies) / elapsed:,.0f} req/s")
+    for label, q in (("p50", 0.50), ("p90", 0.90), ("p99", 0.99), ("p99.9", 0.999), ("max", 1.0)):
+        print(f"{label:>6}: {percentile(latencies, q) * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,97 +1,299 @@
+import argparse
+import asyncio
+import math
+import operator
+import os
+import stat
+import sys
+from array import array
+from collections import OrderedDict, deque
+from enum import Enum, auto
+from itertools import islice
+from multiprocessing import Pool
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class Tok(Enum):
+    NUM = auto()
+    NAME = auto()
+    PLUS = auto()
+    MINUS = auto()
+    STAR = auto()
+    SLASH = auto()
+    CARET = auto()
+    PERCENT = auto()
+    LPAREN = auto()
+    RPAREN = auto()
+    END = auto()
+    NEG = auto()
+
+SYMBOLS = {"+": Tok.PLUS, "-": Tok.MINUS, "*": Tok.STAR, "/": Tok.SLASH, "^": Tok.CARET,
+           "%": Tok.PERCENT, "(": Tok.LPAREN, ")": Tok.RPAREN}
+
 def tokenize(expr: str):
+    # One pass over the text: numbers come out as floats and everything else
+    # as Tok members, so nothing downstream re-inspects strings. Parentheses
+    # are balance-checked here, so parse() only has to report bad syntax.
     expr = expr.replace(" ", "")
     tokens = []
-    number = ""
-
-    for i, ch in enumerate(expr):
+    depth = 0
+    i, n = 0, len(expr)
+    while i < n:
+        ch = expr[i]
+        start = i
         if ch.isdigit() or ch == ".":
-            number += ch
-            continue
+            while i < n and (expr[i].isdigit() or expr[i] == "."):
+                i += 1
+            try:
+                tokens.append((Tok.NUM, float(expr[start:i])))
+            except ValueError:
+                raise ValueError(f"Invalid token: {expr[start:i]}") from None
+        elif ch.isalpha() or ch == "_":
+            while i < n and (expr[i].isalnum() or expr[i] == "_"):
+                i += 1
+            tokens.append((Tok.NAME, expr[start:i]))
+        elif ch in SYMBOLS:
+            if ch == "(":
+                depth += 1
+            elif ch == ")":
+                if not depth:
+                    raise ValueError("Mismatched parentheses")
+                depth -= 1
+            tokens.append((SYMBOLS[ch], ch))
+            i += 1
+        else:
+            raise ValueError(f"Invalid token: {ch}")
+    if depth:
+        raise ValueError("Mismatched parentheses")
+    tokens.append((Tok.END, None))
+    return tokens
 
-        if number:
-            tokens.append(number)
-            number = ""
+# Binding powers (left, right). ^ is right-associative; unary minus sits
+# below ^ so -2^2 is -(2^2), and postfix % binds tightest.
+INFIX_BP = {Tok.PLUS: (1, 2), Tok.MINUS: (1, 2), Tok.STAR: (3, 4), Tok.SLASH: (3, 4), Tok.CARET: (6, 5)}
+PREFIX_BP = 5
+POSTFIX_BP = 7
 
-        if ch == "-" and (i == 0 or expr[i-1] in "+-*/^%("):
-            tokens.append("0")
-            tokens.append("-")
-            continue
+def parse(expr: str):
+    # Pratt parser over tokenize() output. Returns an AST of tuples:
+    # (NUM, value), (NAME, name), (NEG | PERCENT, x) or (op, left, right).
+    tokens = tokenize(expr)
+    pos = 0
 
-        tokens.append(ch)
+    def expression(min_bp):
+        nonlocal pos
+        kind, value = tokens[pos]
+        pos += 1
+        if kind is Tok.NUM or kind is Tok.NAME:
+            left = (kind, value)
+        elif kind is Tok.MINUS:
+            left = (Tok.NEG, expression(PREFIX_BP))
+        elif kind is Tok.LPAREN:
+            left = expression(0)
+            if tokens[pos][0] is not Tok.RPAREN:
+                raise SyntaxError("Invalid expression")
+            pos += 1
+        else:
+            raise SyntaxError("Invalid expression")
 
-    if number:
-        tokens.append(number)
+        while True:
+            kind = tokens[pos][0]
+            if kind is Tok.PERCENT and POSTFIX_BP >= min_bp:
+                pos += 1
+                left = (Tok.PERCENT, left)
+                continue
+            bp = INFIX_BP.get(kind)
+            if bp is None or bp[0] < min_bp:
+                return left
+            pos += 1
+            left = (kind, left, expression(bp[1]))
 
-    return tokens
+    tree = expression(0)
+    if tokens[pos][0] is not Tok.END:
+        raise SyntaxError("Invalid expression")
+    return tree
+
+def _lookup(variables, name):
+    try:
+        return variables[name]
+    except (KeyError, TypeError):
+        raise ValueError(f"Unknown variable: {name}") from None
+
+def _divide(a, b):
+    if b == 0:
+        raise ZeroDivisionError("Division by zero")
+    return a / b
+
+def _percent(a):
+    return a / 100
+
+UNARY_OPS = {Tok.NEG: operator.neg, Tok.PERCENT: _percent}
+BINARY_OPS = {Tok.PLUS: operator.add, Tok.MINUS: operator.sub, Tok.STAR: operator.mul,
+              Tok.SLASH: _divide, Tok.CARET: operator.pow}
+
+def eval_tree(node, variables=None):
+    kind = node[0]
+    if kind is Tok.NUM:
+        return node[1]
+    if kind is Tok.NAME:
+        return _lookup(variables, node[1])
+    if kind in UNARY_OPS:
+        return UNARY_OPS[kind](eval_tree(node[1], variables))
+    return BINARY_OPS[kind](eval_tree(node[1], variables), eval_tree(node[2], variables))
+
+def compile_tree(node):
+    # Turns the AST into a chain of closures that can be called again (with a
+    # dict of variables) without re-tokenizing or re-parsing.
+    kind = node[0]
+    if kind is Tok.NUM:
+        value = node[1]
+        return lambda env: value
+    if kind is Tok.NAME:
+        name = node[1]
+        return lambda env: _lookup(env, name)
+    if kind in UNARY_OPS:
+        op, a = UNARY_OPS[kind], compile_tree(node[1])
+        return lambda env: op(a(env))
+    op, a, b = BINARY_OPS[kind], compile_tree(node[1]), compile_tree(node[2])
+    return lambda env: op(a(env), b(env))
+
+def compile_expression(expr: str):
+    return compile_tree(parse(expr))
+
+class ExpressionCache:
+    # LRU cache of compiled expressions keyed by the expression with spaces
+    # removed (the same normalization tokenize does).
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._compiled = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, expr: str):
+        key = expr.replace(" ", "")
+        fn = self._compiled.get(key)
+        if fn is not None:
+            self._compiled.move_to_end(key)
+            self.hits += 1
+            return fn
+        self.misses += 1
+        fn = compile_expression(key)
+        self._compiled[key] = fn
+        if len(self._compiled) > self.maxsize:
+            self._compiled.popitem(last=False)
+            self.evictions += 1
+        return fn
+
+    def clear(self):
+        self._compiled.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "size": len(self._compiled), "maxsize": self.maxsize}
+
+expression_cache = ExpressionCache()
+
+def _pow_or_nan(a, b):
+    # Element-wise ^ for the array fallback, matching NumPy: out-of-range
+    # results become +-inf and complex ones nan.
+    try:
+        result = a ** b
+    except OverflowError:
+        odd = b.is_integer() and b % 2 == 1
+        return math.copysign(math.inf, a) if odd else math.inf
+    return result if isinstance(result, float) else math.nan
 
-def to_rpn(tokens:list[str] ):
-    output = []
-    stack = []
-    p = {"+":1, "-":1, "*":2, "/":2, "^":3, "%":4}
-    right_ = {"^"}
-
-    def should_pop(op1, op2):
-        return p[op1] < p[op2] if op1 in right_ else p[op1] <= p[op2]
-
-    for token in tokens:
-        if token.replace(".", "", 1).isdigit():
-            output.append(token)
-        elif token in p:
-            while stack and stack[-1] in p and should_pop(token, stack[-1]):
-                output.append(stack.pop())
-            stack.append(token)
-        elif token == "(":
-            stack.append(token)
-        elif token == ")":
-            while stack and stack[-1] != "(":
-                output.append(stack.pop())
-            if stack:
-                stack.pop()
-            else:
-                raise ValueError("Mismatched parentheses")
+def _walk(node, env, const, unary, binary):
+    kind = node[0]
+    if kind is Tok.NUM:
+        return const(node[1])
+    if kind is Tok.NAME:
+        return _lookup(env, node[1])
+    if kind in UNARY_OPS:
+        return unary(kind, _walk(node[1], env, const, unary, binary))
+    return binary(kind, _walk(node[1], env, const, unary, binary), _walk(node[2], env, const, unary, binary))
+
+def _evaluate_numpy(tree, arrays):
+    env = {k: np.asarray(v, dtype=float) for k, v in arrays.items()}
+    # Scalars alone still give one row, like the array("d") fallback.
+    shape = np.broadcast_shapes(*(v.shape for v in env.values())) or (1,)
+    zero_div = np.zeros(shape, dtype=bool)
+
+    def unary(kind, a):
+        return UNARY_OPS[kind](a)
+
+    def binary(kind, a, b):
+        if kind is Tok.SLASH:
+            hit = b == 0
+        elif kind is Tok.CARET:
+            hit = (a == 0) & (b < 0)
         else:
-            raise ValueError(f"Invalid token: {token}")
-
-    while stack:
-        if stack[-1] in {"(", ")"}:
-            raise ValueError("Mismatched parentheses")
-        output.append(stack.pop())
-    return output
-
-def eval_rpn(rpn):
-    stack = []
-    for token in rpn:
-        if token.replace(".", "", 1).isdigit():
-            stack.append(float(token))
+            return BINARY_OPS[kind](a, b)
+        zero_div[...] |= hit
+        return np.where(hit, np.nan, a / b if kind is Tok.SLASH else a ** b)
+
+    with np.errstate(all="ignore"):
+        result = _walk(tree, env, np.float64, unary, binary)
+    values = np.array(np.broadcast_to(result, shape), dtype=float)
+    values[zero_div] = np.nan
+    return values, zero_div
+
+def _evaluate_array(tree, arrays):
+    env = {k: float(v) if isinstance(v, (int, float)) else array("d", v) for k, v in arrays.items()}
+    sizes = {len(v) for v in env.values() if isinstance(v, array)}
+    if len(sizes) > 1:
+        raise ValueError("Arrays must have the same length")
+    size = sizes.pop() if sizes else 1
+    zero_div = array("b", bytes(size))
+
+    def column(x):
+        return [x] * size if isinstance(x, float) else x
+
+    def unary(kind, a):
+        fn = UNARY_OPS[kind]
+        return fn(a) if isinstance(a, float) else array("d", map(fn, a))
+
+    def binary(kind, a, b):
+        if kind is Tok.SLASH:
+            hits = [y == 0 for y in column(b)]
+            fn = lambda x, y: math.nan if y == 0 else x / y
+        elif kind is Tok.CARET:
+            hits = [x == 0 and y < 0 for x, y in zip(column(a), column(b))]
+            fn = lambda x, y: math.nan if x == 0 and y < 0 else _pow_or_nan(x, y)
         else:
-            if token == "%":
-                a = stack.pop()
-                stack.append(a / 100)
-                continue
-            b = stack.pop()
-            a = stack.pop()
-            match token:
-                case "+":
-                    stack.append(a + b)
-                case "-":
-                    stack.append(a - b)
-                case "*":
-                    stack.append(a * b)
-                case "/":
-                    if b == 0:
-                        raise ZeroDivisionError("Division by zero")
-                    stack.append(a / b)
-                case "^":
-                    stack.append(a ** b)
-                case _:
-                    raise ValueError(f"Unknown operator: {token}")
-    return stack[0]
-
-def calculate(expr: str):
+            return array("d", map(BINARY_OPS[kind], column(a), column(b)))
+        for i, hit in enumerate(hits):
+            if hit:
+                zero_div[i] = 1
+        return array("d", map(fn, column(a), column(b)))
+
+    values = array("d", column(_walk(tree, env, float, unary, binary)))
+    for i, hit in enumerate(zero_div):
+        if hit:
+            values[i] = math.nan
+    return values, zero_div
+
+def evaluate(expr: str, **arrays):
+    # Runs the expression once over whole columns: NumPy arrays when NumPy is
+    # installed, array("d") otherwise. Returns (values, zero_div) where
+    # zero_div flags the rows that divided by zero (their value is nan)
+    # instead of raising on the first one.
+    try:
+        tree = parse(expr)
+    except SyntaxError:
+        raise ValueError("Invalid expression") from None
+    if np is not None:
+        return _evaluate_numpy(tree, arrays)
+    return _evaluate_array(tree, arrays)
+
+def calculate(expr: str, **variables):
     try:
-        tokens = tokenize(expr)
-        rpn = to_rpn(tokens)
-        result = eval_rpn(rpn)
+        result = expression_cache.get(expr)({k: float(v) for k, v in variables.items()})
         return int(result) if result.is_integer() else result
     except ZeroDivisionError:
         return "Error: Division by zero is not allowed."
@@ -100,7 +302,97 @@ def calculate(expr: str):
     except Exception:
         return "Error: Invalid expression."
 
-def main():
+def _calculate_chunk(exprs):
+    return list(map(calculate, exprs))
+
+def calculate_many(exprs, workers=None, chunksize=256, in_flight=2):
+    # Yields calculate() results in input order. With more than one worker
+    # the expressions are fanned out to a process pool in chunks; every
+    # worker keeps its own warm expression_cache. At most `in_flight` chunks
+    # per worker are read ahead, so a slow consumer doesn't make the whole
+    # input pile up in memory.
+    if workers == 1:
+        yield from map(calculate, exprs)
+        return
+    workers = workers or os.cpu_count() or 1
+    exprs = iter(exprs)
+    pending = deque()
+    with Pool(workers) as pool:
+        while True:
+            while len(pending) < workers * in_flight and (chunk := list(islice(exprs, chunksize))):
+                pending.append(pool.apply_async(_calculate_chunk, (chunk,)))
+            if not pending:
+                break
+            yield from pending.popleft().get()
+
+WRITE_BATCH = 8192
+
+def run_stream(infile, outfile, workers=1, chunksize=256):
+    # One expression per input line, one result per output line, written a
+    # batch at a time.
+    exprs = (line.rstrip("\r\n") for line in infile)
+    results = calculate_many(exprs, workers, chunksize)
+    while batch := list(islice(results, WRITE_BATCH)):
+        outfile.write("".join(f"{r}\n" for r in batch))
+    outfile.flush()
+
+async def _serve_client(reader, writer):
+    # Newline-delimited protocol: one expression per line in, one result per
+    # line out, in order. Clients may pipeline; every complete line already
+    # received is answered in a single write.
+    buffer = bytearray()
+    try:
+        while data := await reader.read(65536):
+            buffer += data
+            end = buffer.rfind(b"\n")
+            if end < 0:
+                continue
+            lines = buffer[:end].decode("utf-8", "replace").split("\n")
+            del buffer[:end + 1]
+            writer.write("".join(f"{calculate(line.rstrip(chr(13)))}\n" for line in lines).encode("utf-8"))
+            await writer.drain()
+        if buffer:
+            writer.write(f"{calculate(buffer.decode('utf-8', 'replace'))}\n".encode("utf-8"))
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def serve(path):
+    # All clients share this process's expression_cache, so it stays warm.
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(_serve_client, path)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calculator. Without arguments it runs interactively.")
+    parser.add_argument("input", nargs="?", help="file with one expression per line, or - for stdin")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="worker processes (default: %(default)s)")
+    parser.add_argument("--chunksize", type=int, default=256)
+    parser.add_argument("--serve", metavar="SOCKET", help="run as a service on this Unix socket path")
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        try:
+            asyncio.run(serve(args.serve))
+        except KeyboardInterrupt:
+            pass
+        return
+    if args.input == "-":
+        run_stream(sys.stdin, sys.stdout, args.workers, args.chunksize)
+        return
+    if args.input:
+        with open(args.input, encoding="utf-8") as f:
+            run_stream(f, sys.stdout, args.workers, args.chunksize)
+        return
+
     print("Enter expression (type 'exit' or 'quit' to quit):")
     while True:
         s = input("> ")